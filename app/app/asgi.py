@@ -7,10 +7,48 @@ For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
 
+import asyncio
 import os
 
+from asgiref.sync import ThreadSensitiveContext
+from django.conf import settings
 from django.core.asgi import get_asgi_application
+from django.urls import reverse
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+if settings.WARMUP_ON_STARTUP:
+    from core.health import warmup
+    warmup()
+
+# Sync views normally share a single thread under ASGI. Requests that hash
+# passwords get a thread of their own instead, so while they wait for the
+# hashing pool the recipe endpoints keep being served. No more of them are
+# let in than the pool has workers, so those threads stay bounded and the
+# rest wait on the event loop without holding a thread.
+PASSWORD_HASHING_PATHS = frozenset((
+    reverse('users:auth-token'),
+    reverse('users:create'),
+))
+_hashing_slots = None
+
+
+def hashing_slots():
+    """Return the semaphore admitting password hashing requests
+
+    Created on first use, so it belongs to the event loop of the server.
+    """
+    global _hashing_slots
+    if _hashing_slots is None:
+        _hashing_slots = asyncio.Semaphore(settings.PASSWORD_HASHING_WORKERS)
+    return _hashing_slots
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] in PASSWORD_HASHING_PATHS:
+        async with hashing_slots(), ThreadSensitiveContext():
+            return await django_application(scope, receive, send)
+
+    return await django_application(scope, receive, send)
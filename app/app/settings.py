@@ -54,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.RequestTimingMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -80,18 +81,48 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Connections return to a per process pool at the end of each request and
+# are reused by any thread for up to DB_CONN_MAX_AGE seconds. Size
+# DB_POOL_MAX_SIZE so that processes x max size stays below the Postgres
+# max_connections, see core.db.base.DatabaseWrapper.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASS')
-        
+        'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'POOL': {
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 0)) or None,
+            'TIMEOUT': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'HEALTH_CHECKS': bool(int(os.environ.get('DB_HEALTH_CHECKS', 1))),
+            'IDLE_TIMEOUT': int(os.environ.get('DB_IDLE_TIMEOUT', 300)),
+        },
     }
 }
 
 
+# Read replicas, one alias per host sharing the primary credentials. Safe
+# requests on the recipe endpoints read from them, see core.routers.
+DATABASE_REPLICAS = []
+for index, host in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))):
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Seconds a user reads from the primary after writing, covering the lag
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+# Seconds an unreachable replica is skipped before it is tried again
+REPLICA_RETRY_SECONDS = int(os.environ.get('REPLICA_RETRY_SECONDS', 30))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -141,4 +172,82 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # ADDED SETTINGS
 
-AUTH_USER_MODEL = 'core.CustomUser'
\ No newline at end of file
+AUTH_USER_MODEL = 'core.CustomUser'
+
+# Largest page size clients may request from the cursor paginated lists
+RECIPE_PAGINATION_MAX_PAGE_SIZE = int(
+    os.environ.get('RECIPE_PAGINATION_MAX_PAGE_SIZE', 100)
+)
+
+# In-process token authentication cache, see core.authentication
+TOKEN_CACHE_MAX_SIZE = int(os.environ.get('TOKEN_CACHE_MAX_SIZE', 10000))
+TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', 60))
+
+AUTHENTICATION_BACKENDS = ['core.backends.PooledModelBackend']
+
+# Number of passwords hashed concurrently, see core.hashing
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', 2))
+
+# Limits of the bulk recipe and tag/ingredient batch endpoints
+RECIPE_BULK_MAX_ITEMS = int(os.environ.get('RECIPE_BULK_MAX_ITEMS', 5000))
+RECIPE_BULK_BATCH_SIZE = int(os.environ.get('RECIPE_BULK_BATCH_SIZE', 1000))
+
+# Number of recipes loaded per query by the streaming export
+RECIPE_EXPORT_CHUNK_SIZE = int(os.environ.get('RECIPE_EXPORT_CHUNK_SIZE', 2000))
+
+# Resized copies generated in the background for uploaded recipe images
+RECIPE_IMAGE_RENDITIONS = {
+    'thumbnail': (200, 200),
+    'medium': (800, 800),
+}
+RECIPE_IMAGE_RENDITION_QUALITY = 80
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+# Renditions still pending after this are queued again by requeue_renditions
+RECIPE_IMAGE_REQUEUE_MINUTES = int(
+    os.environ.get('RECIPE_IMAGE_REQUEUE_MINUTES', 15)
+)
+
+# Largest recipe image accepted by the resumable upload endpoints
+RECIPE_UPLOAD_MAX_SIZE = int(
+    os.environ.get('RECIPE_UPLOAD_MAX_SIZE', 50 * 1024 * 1024)
+)
+# Partially received uploads, kept outside MEDIA_ROOT as media is public
+RECIPE_UPLOAD_PARTIAL_ROOT = os.environ.get(
+    'RECIPE_UPLOAD_PARTIAL_ROOT', '/vol/web/partial'
+)
+# Unfinished uploads older than this are deleted by expire_uploads
+RECIPE_UPLOAD_MAX_AGE_HOURS = int(
+    os.environ.get('RECIPE_UPLOAD_MAX_AGE_HOURS', 24)
+)
+
+# Media serving, see core.views.serve_media. MEDIA_SENDFILE may be
+# 'x-sendfile' or 'x-accel-redirect' to let the front proxy send the bytes.
+MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', 86400))
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get(
+    'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/'
+)
+
+# Text search configuration used for the recipe search vector
+RECIPE_SEARCH_CONFIG = os.environ.get('RECIPE_SEARCH_CONFIG', 'english')
+
+# Tag and ingredient name autocomplete, see recipe.autocomplete
+RECIPE_AUTOCOMPLETE_CACHE_SIZE = int(
+    os.environ.get('RECIPE_AUTOCOMPLETE_CACHE_SIZE', 1000)
+)
+RECIPE_AUTOCOMPLETE_LIMIT = 10
+RECIPE_AUTOCOMPLETE_MAX_LIMIT = 50
+RECIPE_AUTOCOMPLETE_SIMILARITY = 0.3
+
+# Fill lazy caches and check the database when the WSGI or ASGI application
+# is loaded, before any request is served, see core.health.warmup
+WARMUP_ON_STARTUP = bool(int(os.environ.get('WARMUP_ON_STARTUP', 0)))
+
+# Per request Server-Timing header and slow request log, see
+# core.middleware.RequestTimingMiddleware
+REQUEST_TIMING = bool(int(os.environ.get('REQUEST_TIMING', 0)))
+REQUEST_TIMING_SLOW_MS = int(os.environ.get('REQUEST_TIMING_SLOW_MS', 500))
+REQUEST_TIMING_SLOW_QUERIES = int(
+    os.environ.get('REQUEST_TIMING_SLOW_QUERIES', 50)
+)
+REQUEST_TIMING_LOGGED_QUERIES = 5
@@ -0,0 +1,109 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import SAFE_METHODS
+
+
+class TokenCache:
+    """Thread safe, bounded LRU cache of token keys with expiry"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.generation = 0
+        self._entries = OrderedDict()
+        # Keys cached for each user, so their eviction needs no scan
+        self._user_keys = {}
+        self._lock = threading.Lock()
+
+    def _remove(self, key):
+        """Drop an entry and its user index, holding the lock"""
+        entry = self._entries.pop(key, None)
+        if entry is None or entry[2] is None:
+            return
+        keys = self._user_keys[entry[2]]
+        keys.discard(key)
+        if not keys:
+            del self._user_keys[entry[2]]
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value, _ = entry
+            if expires <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, generation, user_pk=None):
+        """Cache value unless an invalidation happened since generation"""
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value, user_pk)
+            if user_pk is not None:
+                self._user_keys.setdefault(user_pk, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key):
+        """Evict a single token"""
+        with self._lock:
+            self.generation += 1
+            self._remove(key)
+
+    def delete_user(self, user_pk):
+        """Evict every token belonging to a user"""
+        with self._lock:
+            self.generation += 1
+            for key in list(self._user_keys.get(user_pk, ())):
+                self._remove(key)
+
+    def clear(self):
+        """Evict all tokens"""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._user_keys.clear()
+
+
+token_cache = TokenCache(
+    max_size=settings.TOKEN_CACHE_MAX_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL,
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that skips the database for recently seen tokens
+
+    Entries are evicted in this process when the token is deleted or the
+    user is saved, which covers deactivation and password changes. Other
+    processes are not told, so requests that change data always check the
+    token and user against the database. Reads elsewhere pick up changes
+    once their entry expires, so the TTL bounds how long a revoked token
+    may keep reading.
+    """
+    use_cache = True
+
+    def authenticate(self, request):
+        self.use_cache = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key) if self.use_cache else None
+        if cached is None:
+            generation = token_cache.generation
+            cached = super().authenticate_credentials(key)
+            token_cache.set(key, cached, generation, user_pk=cached[0].pk)
+
+        user, token = cached
+        return copy.copy(user), token
@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, make_password
+
+from .hashing import hashing_pool
+
+
+UserModel = get_user_model()
+
+
+def verify_password(password, encoded):
+    """Check password against encoded, returning a new hash if one is due"""
+    rehashed = []
+    valid = check_password(
+        password, encoded,
+        setter=lambda raw: rehashed.append(make_password(raw)),
+    )
+    return valid, rehashed[0] if rehashed else None
+
+
+class PooledModelBackend(ModelBackend):
+    """Model backend that verifies passwords on the hashing pool"""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway so unknown users take as long as known ones
+            hashing_pool.run(make_password, password)
+            return None
+
+        valid, rehashed = hashing_pool.run(
+            verify_password, password, user.password
+        )
+        if not valid:
+            return None
+        if rehashed:
+            user.password = rehashed
+            user.save(update_fields=['password'])
+
+        return user if self.user_can_authenticate(user) else None
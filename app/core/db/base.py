@@ -0,0 +1,277 @@
+import threading
+import time
+from functools import partial
+
+from django.db.backends.postgresql import base
+from django.db.utils import OperationalError
+from psycopg2 import Error as DriverError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+
+class ConnectionPool:
+    """Database connections of this process, shared by its threads
+
+    A thread checks a connection out when it first queries, and checks it
+    back in at the end of the request, so idle threads hold no connection.
+    At most max_size connections are open at once, so every process can be
+    given a share of Postgres max_connections, and threads wait up to
+    timeout seconds for one to be checked in. Connections idle for longer
+    than idle_timeout, or older than max_age, are closed. Connections still
+    checked out by threads that exited, such as runserver's thread per
+    request, are closed and their slots reclaimed.
+    """
+
+    def __init__(self, max_size=None, timeout=10, max_age=None,
+                 idle_timeout=None, health_checks=False):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.idle_timeout = idle_timeout
+        self.health_checks = health_checks
+        self._lock = threading.Lock()
+        self._checked_in = threading.Condition(self._lock)
+        # Most recently used last, so busy periods reuse warm connections
+        self._idle = []
+        self._owners = {}
+        self._stats = {
+            'connects': 0,
+            'reuses': 0,
+            'reclaims': 0,
+            'open': 0,
+            'health_check_failures': 0,
+            'idle_closes': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._stats[name] += value
+
+    def _expired(self, created, now):
+        return self.max_age is not None and now - created >= self.max_age
+
+    def _forget(self, connections):
+        """Close connections and free their slots, holding the lock"""
+        for connection in connections:
+            try:
+                connection.close()
+            except Exception:
+                pass
+            self._stats['open'] -= 1
+            self._checked_in.notify()
+
+    def _sweep(self):
+        """Close stale idle connections and reclaim orphaned ones"""
+        now = time.monotonic()
+        stale = [
+            entry for entry in self._idle
+            if self._expired(entry[1], now) or (
+                self.idle_timeout is not None
+                and now - entry[2] >= self.idle_timeout)
+        ]
+        if stale:
+            self._idle = [entry for entry in self._idle if entry not in stale]
+            self._stats['idle_closes'] += len(stale)
+            self._forget(connection for connection, _, _ in stale)
+
+        orphans = [
+            key for key, (thread, _, _) in self._owners.items()
+            if not thread.is_alive()
+        ]
+        self._stats['reclaims'] += len(orphans)
+        self._forget(self._owners.pop(key)[1] for key in orphans)
+
+    def _usable(self, connection):
+        """Return whether an idle connection still answers"""
+        if connection.closed:
+            return False
+        if not self.health_checks:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except DriverError:
+            return False
+
+        return True
+
+    def checkout(self, connect):
+        """Return an idle connection, or one opened with connect()"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._checked_in:
+            while True:
+                self._sweep()
+                if self._idle:
+                    connection, created, _ = self._idle.pop()
+                    break
+                if (self.max_size is None
+                        or self._stats['open'] < self.max_size):
+                    connection, created = None, None
+                    self._stats['open'] += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise OperationalError(
+                        f'No database connection freed up in {self.timeout}s'
+                    )
+                self._checked_in.wait(remaining)
+            waited = time.monotonic() - started
+            self._stats['wait_time_total'] += waited
+            self._stats['wait_time_max'] = max(
+                self._stats['wait_time_max'], waited
+            )
+
+        if connection is not None and not self._usable(connection):
+            # Replace a broken connection, keeping its slot
+            self._count('health_check_failures')
+            try:
+                connection.close()
+            except Exception:
+                pass
+            connection = None
+        if connection is None:
+            try:
+                connection = connect()
+            except Exception:
+                with self._checked_in:
+                    self._stats['open'] -= 1
+                    self._checked_in.notify()
+                raise
+            created = time.monotonic()
+            self._count('connects')
+        else:
+            self._count('reuses')
+
+        with self._lock:
+            self._owners[id(connection)] = (
+                threading.current_thread(), connection, created
+            )
+        return connection
+
+    def checkin(self, connection):
+        """Take back a connection once its thread is done with it
+
+        Connections in a transaction, or past max_age, are closed instead.
+        """
+        now = time.monotonic()
+        with self._checked_in:
+            entry = self._owners.pop(id(connection), None)
+            if entry is None:
+                return
+            created = entry[2]
+            if (connection.closed or self._expired(created, now)
+                    or connection.get_transaction_status()
+                    != TRANSACTION_STATUS_IDLE):
+                self._forget([connection])
+            else:
+                self._idle.append((connection, created, now))
+                self._checked_in.notify()
+            self._sweep()
+
+    def discard(self, connection):
+        """Free the slot of a connection closed by its thread
+
+        Does nothing if the connection was already reclaimed.
+        """
+        with self._checked_in:
+            if self._owners.pop(id(connection), None) is not None:
+                self._forget([connection])
+
+    def close_idle(self):
+        """Close every idle connection"""
+        with self._checked_in:
+            idle, self._idle = self._idle, []
+            self._forget(connection for connection, _, _ in idle)
+
+    def stats(self):
+        """Return a snapshot of the pool counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['idle'] = len(self._idle)
+        stats['max_size'] = self.max_size
+        checkouts = stats['connects'] + stats['reuses']
+        stats['wait_time_avg'] = (
+            stats['wait_time_total'] / checkouts if checkouts else 0.0
+        )
+        return stats
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict):
+    """Return the pool of a database alias, creating it on first use"""
+    with _pools_lock:
+        if alias not in _pools:
+            options = settings_dict.get('POOL', {})
+            _pools[alias] = ConnectionPool(
+                max_size=options.get('MAX_SIZE'),
+                timeout=options.get('TIMEOUT', 10),
+                max_age=settings_dict.get('CONN_MAX_AGE', 0),
+                idle_timeout=options.get('IDLE_TIMEOUT'),
+                health_checks=options.get('HEALTH_CHECKS', False),
+            )
+        return _pools[alias]
+
+
+def stats():
+    """Return the counters of every pool in this process by alias"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.stats() for alias, pool in pools.items()}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL backend taking its connections from a ConnectionPool
+
+    Connections are checked back in at the start and end of each request,
+    when Django would otherwise keep them for CONN_MAX_AGE seconds, which
+    becomes the most a connection is reused for. Closing a connection
+    explicitly, as management commands and worker threads do, really
+    closes it. Besides the standard settings, DATABASES entries accept a
+    POOL dict:
+
+    - MAX_SIZE: most connections this process opens at once
+    - TIMEOUT: seconds to wait for a connection to be checked in
+    - HEALTH_CHECKS: check an idle connection before handing it out
+    - IDLE_TIMEOUT: close connections idle in the pool this many seconds
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = get_pool(self.alias, self.settings_dict)
+        self._checking_in = False
+
+    def get_new_connection(self, conn_params):
+        return self.pool.checkout(
+            partial(super().get_new_connection, conn_params)
+        )
+
+    def _close(self):
+        connection = self.connection
+        if self._checking_in:
+            self.pool.checkin(connection)
+            return
+        try:
+            super()._close()
+        finally:
+            self.pool.discard(connection)
+
+    def close_if_unusable_or_obsolete(self):
+        """Check the connection back in to the pool"""
+        if self.connection is None or self.in_atomic_block:
+            return
+        if (self.get_autocommit() != self.settings_dict['AUTOCOMMIT']
+                or (self.errors_occurred and not self.is_usable())):
+            self.close()
+            return
+
+        self.errors_occurred = False
+        self._checking_in = True
+        try:
+            self.close()
+        finally:
+            self._checking_in = False
@@ -0,0 +1,67 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+class HashingPool:
+    """Bounded worker pool for CPU heavy password hashing
+
+    Callers block until their job finished, but no more than max_workers
+    hashes run at once, so login bursts cannot take every core. The time
+    jobs spend waiting for a free worker is recorded for monitoring.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='password-hashing',
+        )
+        self._lock = threading.Lock()
+        self._stats = {
+            'jobs': 0,
+            'started': 0,
+            'pending': 0,
+            'queue_time_total': 0.0,
+            'queue_time_max': 0.0,
+        }
+
+    def _started(self, queued_at):
+        """Record the time a job waited for a worker"""
+        waited = time.monotonic() - queued_at
+        with self._lock:
+            self._stats['started'] += 1
+            self._stats['pending'] -= 1
+            self._stats['queue_time_total'] += waited
+            self._stats['queue_time_max'] = max(
+                self._stats['queue_time_max'], waited
+            )
+
+    def run(self, func, *args, **kwargs):
+        """Run func on the pool and return its result"""
+        queued_at = time.monotonic()
+        with self._lock:
+            self._stats['jobs'] += 1
+            self._stats['pending'] += 1
+
+        def job():
+            self._started(queued_at)
+            return func(*args, **kwargs)
+
+        return self._executor.submit(job).result()
+
+    def stats(self):
+        """Return a snapshot of the pool counters"""
+        with self._lock:
+            stats = dict(self._stats)
+        # Jobs still waiting for a worker have no queue time yet
+        stats['queue_time_avg'] = (
+            stats['queue_time_total'] / stats['started']
+            if stats['started'] else 0.0
+        )
+        return stats
+
+
+hashing_pool = HashingPool(max_workers=settings.PASSWORD_HASHING_WORKERS)
@@ -0,0 +1,64 @@
+import logging
+
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.urls import URLResolver, get_resolver
+
+
+logger = logging.getLogger(__name__)
+
+_migrated = set()
+
+
+def check_database(alias=DEFAULT_DB_ALIAS):
+    """Make a round trip to the database, raising if it is unreachable"""
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def migrations_applied(alias=DEFAULT_DB_ALIAS):
+    """Return whether every migration has been applied to the database
+
+    Only a positive answer is kept, as migrations are not unapplied under
+    a running server, so the migration graph is loaded until then.
+    """
+    if alias not in _migrated:
+        executor = MigrationExecutor(connections[alias])
+        if executor.migration_plan(executor.loader.graph.leaf_nodes()):
+            return False
+        _migrated.add(alias)
+
+    return True
+
+
+def _view_classes(patterns):
+    """Yield the class based views routed by url patterns"""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _view_classes(pattern.url_patterns)
+        elif hasattr(pattern.callback, 'cls'):
+            yield pattern.callback.cls
+
+
+def warmup():
+    """Check the database and fill lazy caches before serving
+
+    The URL resolver, model metadata and serializer fields are otherwise
+    built by the first requests, which then pay for it in latency. The
+    connections used are closed afterwards, so none outlives the warmup or
+    is shared by workers forked after it. An unreachable database is only
+    logged, the server still starts and readyz reports it.
+    """
+    try:
+        check_database()
+        resolver = get_resolver()
+        resolver.reverse_dict
+        for view_class in set(_view_classes(resolver.url_patterns)):
+            serializer_class = getattr(view_class, 'serializer_class', None)
+            if serializer_class is not None:
+                serializer_class().fields
+    except DatabaseError:
+        logger.exception('Warmup failed')
+    finally:
+        connections.close_all()
@@ -0,0 +1,349 @@
+import io
+import json
+import random
+import tempfile
+import threading
+import time
+import uuid
+
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import token_cache
+from core.models import Tag, Ingredient, Recipe
+from recipe import renditions
+
+
+DEFAULT_BASELINE = settings.BASE_DIR / 'benchmarks' / 'baseline.json'
+PASSWORD = 'benchmarkPASS123'
+WORDS = (
+    'chicken', 'beef', 'tofu', 'salmon', 'lentil', 'pasta', 'rice', 'curry',
+    'soup', 'salad', 'roast', 'spicy', 'lemon', 'garlic', 'ginger', 'honey',
+)
+
+
+def percentile(timings, share):
+    """Return the nearest-rank percentile of sorted timings"""
+    return timings[min(len(timings) - 1, int(share * len(timings)))]
+
+
+def wait_for_renditions():
+    """Wait until the background rendition jobs queued so far finished
+
+    Every worker is made to wait on a barrier, which they can only all
+    reach once no earlier job is running.
+    """
+    workers = settings.RECIPE_IMAGE_WORKERS
+    barrier = threading.Barrier(workers, timeout=60)
+    for future in [
+        renditions.executor.submit(barrier.wait) for _ in range(workers)
+    ]:
+        future.result()
+
+
+class Command(BaseCommand):
+    """Measure latency, throughput and queries of every API endpoint"""
+    help = 'Benchmark the API endpoints on seeded data against a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=3)
+        parser.add_argument('--recipes', type=int, default=200,
+                            help='Recipes per user')
+        parser.add_argument('--tags', type=int, default=20,
+                            help='Tags per user')
+        parser.add_argument('--ingredients', type=int, default=40,
+                            help='Ingredients per user')
+        parser.add_argument('--requests', type=int, default=30,
+                            help='Timed requests per endpoint')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--endpoint', action='append',
+                            help='Only run these endpoints')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+        parser.add_argument('--save-baseline', action='store_true')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.5,
+            help='Allowed p95 slowdown against the baseline, as a ratio',
+        )
+
+    def seed(self, options):
+        """Create users with tokens, tags, ingredients and linked recipes"""
+        rng = self.rng
+        data = []
+        for _ in range(options['users']):
+            user = get_user_model().objects.create_user(
+                email=f'benchmark-{uuid.uuid4()}@example.com',
+                password=PASSWORD,
+            )
+            tags = Tag.objects.bulk_create([
+                Tag(user=user, name=f'{rng.choice(WORDS)} tag {i}')
+                for i in range(options['tags'])
+            ])
+            ingredients = Ingredient.objects.bulk_create([
+                Ingredient(user=user, name=f'{rng.choice(WORDS)} {i}')
+                for i in range(options['ingredients'])
+            ])
+            recipes = Recipe.objects.bulk_create([
+                Recipe(
+                    user=user,
+                    title=' '.join(rng.sample(WORDS, 3)),
+                    time_minutes=rng.randint(5, 120),
+                    price=rng.randint(100, 5000) / 100,
+                ) for _ in range(options['recipes'])
+            ])
+            tag_links = [
+                Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+                for recipe in recipes
+                for tag in rng.sample(tags, min(len(tags), 3))
+            ]
+            ingredient_links = [
+                Recipe.ingredients.through(
+                    recipe_id=recipe.id, ingredient_id=ingredient.id
+                )
+                for recipe in recipes
+                for ingredient in rng.sample(
+                    ingredients, min(len(ingredients), 5)
+                )
+            ]
+            Recipe.objects.link_bulk(recipes, tag_links, ingredient_links)
+            data.append({
+                'user': user,
+                'token': Token.objects.create(user=user).key,
+                'tags': [tag.id for tag in tags],
+                'recipes': [recipe.id for recipe in recipes],
+            })
+
+        with connection.cursor() as cursor:
+            for model in (Tag, Ingredient, Recipe):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+        return data
+
+    def image(self):
+        """Return a small JPEG upload"""
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), color=(200, 100, 50)).save(buffer, 'JPEG')
+        return SimpleUploadedFile(
+            'photo.jpg', buffer.getvalue(), content_type='image/jpeg'
+        )
+
+    def scenarios(self):
+        """Return each endpoint with a function building a random request"""
+        rng = self.rng
+
+        def user():
+            return rng.choice(self.data)
+
+        def recipe_detail(item):
+            return reverse('recipe:recipe-detail',
+                           args=[rng.choice(item['recipes'])])
+
+        return {
+            'recipe-list': lambda item: (
+                'get', reverse('recipe:recipe-list'), {'page_size': 20}),
+            'recipe-filter': lambda item: (
+                'get', reverse('recipe:recipe-list'), {
+                    'tags': ','.join(
+                        map(str, rng.sample(item['tags'], 2))),
+                    'page_size': 20,
+                }),
+            'recipe-search': lambda item: (
+                'get', reverse('recipe:recipe-list'),
+                {'search': rng.choice(WORDS), 'page_size': 20}),
+            'recipe-facets': lambda item: (
+                'get', reverse('recipe:recipe-facets'),
+                {'tags': rng.choice(item['tags'])}),
+            'recipe-retrieve': lambda item: (
+                'get', recipe_detail(item), {}),
+            'recipe-create': lambda item: (
+                'post', reverse('recipe:recipe-list'), {
+                    'title': ' '.join(rng.sample(WORDS, 3)),
+                    'time_minutes': 10,
+                    'price': '5.00',
+                    'tags': rng.sample(item['tags'], 2),
+                    'ingredients': [],
+                }),
+            'recipe-upload-image': lambda item: (
+                'post', reverse('recipe:recipe-upload-image',
+                                args=[rng.choice(item['recipes'])]),
+                {'image': self.image()}),
+            'tag-list': lambda item: (
+                'get', reverse('recipe:tag-list'), {'page_size': 20}),
+            'tag-autocomplete': lambda item: (
+                'get', reverse('recipe:tag-autocomplete'),
+                {'q': rng.choice(WORDS)[:2]}),
+            'ingredient-list': lambda item: (
+                'get', reverse('recipe:ingredient-list'), {}),
+            'user-profile': lambda item: (
+                'get', reverse('users:profile'), {}),
+            'user-create': lambda item: (
+                'post', reverse('users:create'), {
+                    'email': f'benchmark-{uuid.uuid4()}@example.com',
+                    'password': PASSWORD,
+                    'username': 'benchmark',
+                }),
+            'auth-token': lambda item: (
+                'post', reverse('users:auth-token'),
+                {'email': item['user'].email, 'password': PASSWORD}),
+        }, user
+
+    def request(self, client, build, item):
+        """Send one request, failing the run on an error response"""
+        method, url, payload = build(item)
+        fmt = 'multipart' if 'image' in payload else 'json'
+        kwargs = {'format': fmt} if method == 'post' else {}
+        response = getattr(client, method)(
+            url, payload, HTTP_AUTHORIZATION=f'Token {item["token"]}',
+            **kwargs
+        )
+        if response.status_code >= 400:
+            raise CommandError(
+                f'{method.upper()} {url} failed with '
+                f'{response.status_code}: {response.content[:200]}'
+            )
+
+    def measure(self, build, pick_user, count):
+        """Return the statistics of one endpoint
+
+        Queries are counted on a steady state request, once every user sent
+        one and their tokens are cached, whatever endpoints ran before.
+        """
+        client = APIClient()
+        token_cache.clear()
+        for item in self.data:
+            self.request(client, build, item)
+
+        # Counted with a wrapper since request_started clears queries_log
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            self.request(client, build, pick_user())
+
+        timings = []
+        started = time.perf_counter()
+        for _ in range(count):
+            item = pick_user()
+            start = time.perf_counter()
+            self.request(client, build, item)
+            timings.append(time.perf_counter() - start)
+        elapsed = time.perf_counter() - started
+
+        timings.sort()
+        return {
+            'requests': count,
+            'throughput': round(count / elapsed, 1),
+            'p50': round(percentile(timings, 0.50) * 1000, 2),
+            'p95': round(percentile(timings, 0.95) * 1000, 2),
+            'p99': round(percentile(timings, 0.99) * 1000, 2),
+            'queries': len(queries),
+        }
+
+    def compare(self, results, baseline, tolerance):
+        """Return the endpoints that regressed against the baseline"""
+        regressions = []
+        for name, stats in results.items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+            if stats['queries'] > base['queries']:
+                regressions.append(
+                    f'{name}: {stats["queries"]} queries, '
+                    f'baseline {base["queries"]}'
+                )
+            if stats['p95'] > base['p95'] * (1 + tolerance):
+                regressions.append(
+                    f'{name}: p95 {stats["p95"]}ms, baseline {base["p95"]}ms'
+                )
+        return regressions
+
+    def run_scenarios(self, options):
+        """Seed the data and measure the selected endpoints"""
+        self.data = self.seed(options)
+        scenarios, pick_user = self.scenarios()
+        unknown = set(options['endpoint'] or ()) - set(scenarios)
+        if unknown:
+            raise CommandError(
+                f'Unknown endpoints: {", ".join(sorted(unknown))}'
+            )
+        results = {}
+        for name, build in scenarios.items():
+            if options['endpoint'] and name not in options['endpoint']:
+                continue
+            results[name] = self.measure(
+                build, pick_user, options['requests']
+            )
+            self.stdout.write(
+                '{:<20} {throughput:>8} req/s  p50 {p50:>8}ms  '
+                'p95 {p95:>8}ms  p99 {p99:>8}ms  {queries:>3} queries'
+                .format(name, **results[name])
+            )
+        return results
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        volumes = {
+            key: options[key]
+            for key in ('users', 'recipes', 'tags', 'ingredients')
+        }
+
+        # Requests commit as in production, on a throwaway database dropped
+        # afterwards, and uploaded images go to a temporary directory
+        name = connection.settings_dict['NAME']
+        test_settings = connection.settings_dict['TEST']
+        test_name = test_settings['NAME']
+        test_settings['NAME'] = f'benchmark_{name}'
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media_root, \
+                    override_settings(ALLOWED_HOSTS=['testserver'],
+                                      MEDIA_ROOT=media_root):
+                results = self.run_scenarios(options)
+                wait_for_renditions()
+        finally:
+            connection.creation.destroy_test_db(name, verbosity=0)
+            test_settings['NAME'] = test_name
+
+        if options['save_baseline']:
+            with open(options['baseline'], 'w') as f:
+                json.dump({'volumes': volumes, 'endpoints': results}, f,
+                          indent=2, sort_keys=True)
+                f.write('\n')
+            self.stdout.write(self.style.SUCCESS(
+                f'Saved baseline to {options["baseline"]}'
+            ))
+            return
+
+        try:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            self.stdout.write('No baseline to compare with')
+            return
+        if baseline['volumes'] != volumes:
+            self.stdout.write(self.style.WARNING(
+                'Baseline was recorded with other volumes, not comparing'
+            ))
+            return
+
+        regressions = self.compare(
+            results, baseline['endpoints'], options['tolerance']
+        )
+        if regressions:
+            raise CommandError(
+                'Regressions against the baseline:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('No regressions'))
@@ -0,0 +1,75 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Tag, Ingredient
+from recipe.views import RecipeViewSet
+
+
+class Command(BaseCommand):
+    """Compare per-item and bulk recipe creation throughput"""
+    help = 'Benchmark creating recipes one by one against the bulk endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=500)
+
+    def create_payloads(self, user, count):
+        """Return recipe payloads linked to a few tags and ingredients"""
+        tags = [
+            Tag.objects.create(user=user, name=f'Tag {i}').id
+            for i in range(5)
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=user, name=f'Ingredient {i}').id
+            for i in range(5)
+        ]
+
+        return [{
+            'title': f'Recipe {i}',
+            'time_minutes': 10,
+            'price': '5.00',
+            'tags': tags[i % 5:] or tags,
+            'ingredients': ingredients[:i % 5 + 1],
+        } for i in range(count)]
+
+    def time_requests(self, user, action, payloads):
+        """Post each payload to a viewset action, returning elapsed seconds"""
+        factory = APIRequestFactory()
+        view = RecipeViewSet.as_view({'post': action})
+
+        start = time.perf_counter()
+        for payload in payloads:
+            request = factory.post('/', payload, format='json')
+            force_authenticate(request, user=user)
+            response = view(request)
+            if response.status_code != 201:
+                raise CommandError(f'{action} failed: {response.data}')
+
+        return time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        count = options['count']
+
+        # Everything is rolled back so the benchmark leaves no data behind
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                email=f'benchmark-{uuid.uuid4()}@example.com'
+            )
+            payloads = self.create_payloads(user, count)
+
+            single = self.time_requests(user, 'create', payloads)
+            bulk = self.time_requests(user, 'bulk', [payloads])
+            transaction.set_rollback(True)
+
+        for label, elapsed in (('per-item', single), ('bulk', bulk)):
+            self.stdout.write(
+                f'{label}: {count} recipes in {elapsed:.3f}s '
+                f'({count / elapsed:.0f} recipes/s)'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Bulk creation is {single / bulk:.1f}x faster'
+        ))
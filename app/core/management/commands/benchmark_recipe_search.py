@@ -0,0 +1,133 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.views import RecipeViewSet
+
+
+WORDS = (
+    'chicken', 'beef', 'tofu', 'salmon', 'lentil', 'pasta', 'rice', 'curry',
+    'soup', 'salad', 'roast', 'spicy', 'lemon', 'garlic', 'ginger', 'honey',
+    'smoky', 'crispy', 'creamy', 'baked', 'grilled', 'stew', 'pie', 'taco',
+)
+
+
+class Command(BaseCommand):
+    """Compare full-text recipe search against an icontains scan"""
+    help = 'Benchmark ?search= against an icontains baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def create_recipes(self, user, count, batch_size, rng):
+        """Insert count recipes with random titles, tags and ingredients"""
+        tags = [
+            Tag.objects.create(user=user, name=word) for word in WORDS[:8]
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=user, name=word)
+            for word in WORDS[:16]
+        ]
+        for start in range(0, count, batch_size):
+            recipes = Recipe.objects.bulk_create([
+                Recipe(
+                    user=user,
+                    title=' '.join(rng.sample(WORDS, 3)),
+                    time_minutes=10,
+                    price='5.00',
+                )
+                for _ in range(min(batch_size, count - start))
+            ])
+            Recipe.objects.link_bulk(recipes, [
+                Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+                for recipe in recipes
+                for tag in rng.sample(tags, 2)
+            ], [
+                Recipe.ingredients.through(
+                    recipe_id=recipe.id, ingredient_id=ingredient.id
+                )
+                for recipe in recipes
+                for ingredient in rng.sample(ingredients, 3)
+            ])
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Recipe._meta.db_table}')
+
+    def time_search(self, user, terms, page_size):
+        """Return per-request seconds of the search endpoint"""
+        # Paginated responses build absolute links from the host
+        factory = APIRequestFactory(HTTP_HOST='localhost')
+        view = RecipeViewSet.as_view({'get': 'list'})
+        timings = []
+        for term in terms:
+            request = factory.get(
+                '/', {'search': term, 'page_size': page_size}
+            )
+            force_authenticate(request, user=user)
+            start = time.perf_counter()
+            response = view(request)
+            response.render()
+            timings.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise CommandError(f'search failed: {response.data}')
+
+        return timings
+
+    def time_icontains(self, user, terms, page_size):
+        """Return per-query seconds of a title/tag/ingredient icontains"""
+        timings = []
+        for term in terms:
+            start = time.perf_counter()
+            list(
+                Recipe.objects.filter(user=user).filter(
+                    Q(title__icontains=term)
+                    | Q(tags__name__icontains=term)
+                    | Q(ingredients__name__icontains=term)
+                ).distinct().order_by('-id')[:page_size]
+            )
+            timings.append(time.perf_counter() - start)
+
+        return timings
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        count = options['count']
+        terms = [
+            ' '.join(rng.sample(WORDS, rng.randint(1, 2)))
+            for _ in range(options['runs'])
+        ]
+
+        # Everything is rolled back so the benchmark leaves no data behind
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                email=f'benchmark-{uuid.uuid4()}@example.com'
+            )
+            self.create_recipes(user, count, options['batch_size'], rng)
+
+            search = self.time_search(user, terms, options['page_size'])
+            baseline = self.time_icontains(
+                user, terms, options['page_size']
+            )
+            transaction.set_rollback(True)
+
+        for label, timings in (('search', search), ('icontains', baseline)):
+            self.stdout.write(
+                f'{label}: median {statistics.median(timings) * 1000:.1f}ms '
+                f'max {max(timings) * 1000:.1f}ms over {len(timings)} runs'
+            )
+        speedup = statistics.median(baseline) / statistics.median(search)
+        self.stdout.write(self.style.SUCCESS(
+            f'Search is {speedup:.1f}x faster on {count} recipes'
+        ))
@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from core.models import Recipe, StoredImage
+from recipe.renditions import rendition_path
+
+
+class Command(BaseCommand):
+    """Delete recipe images that no recipe references any more"""
+    help = 'Garbage collect unreferenced recipe images and their renditions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-minutes', type=int, default=60,
+            help='Keep unreferenced images this long, for in-flight uploads',
+        )
+        parser.add_argument(
+            '--recount', action='store_true',
+            help='Recompute reference counts from the recipes first',
+        )
+
+    def recount(self):
+        """Reset every reference count to the number of recipes using it"""
+        counts = dict(
+            Recipe.objects.exclude(image='').exclude(image=None)
+            .values_list('image').annotate(count=Count('id'))
+        )
+        for name in set(counts) - set(
+            StoredImage.objects.values_list('name', flat=True)
+        ):
+            StoredImage.objects.create(name=name)
+
+        for stored in StoredImage.objects.iterator():
+            refcount = counts.get(stored.name, 0)
+            if stored.refcount != refcount:
+                StoredImage.objects.filter(pk=stored.pk).update(
+                    refcount=refcount, updated=timezone.now()
+                )
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            self.recount()
+
+        storage = Recipe._meta.get_field('image').storage
+        cutoff = timezone.now() - timedelta(minutes=options['grace_minutes'])
+        collected = 0
+        unreferenced = StoredImage.objects.filter(
+            refcount__lte=0, updated__lt=cutoff
+        )
+        for pk in unreferenced.values_list('pk', flat=True).iterator():
+            # Re-check under the row lock saving the same image takes, so
+            # a concurrent upload reusing the file keeps it
+            with transaction.atomic():
+                stored = unreferenced.select_for_update(
+                    skip_locked=True
+                ).filter(pk=pk).first()
+                if stored is None:
+                    continue
+
+                storage.delete(stored.name)
+                for rendition in settings.RECIPE_IMAGE_RENDITIONS:
+                    default_storage.delete(
+                        rendition_path(stored.name, rendition)
+                    )
+                stored.delete()
+                collected += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Collected {collected} unreferenced images'
+        ))
@@ -0,0 +1,61 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import RecipeImageUpload
+from recipe.uploads import discard_upload
+
+
+class Command(BaseCommand):
+    """Delete resumable upload sessions that were never finalized"""
+    help = 'Expire abandoned recipe image uploads and their partial files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age-hours', type=int,
+            default=settings.RECIPE_UPLOAD_MAX_AGE_HOURS,
+            help='Expire sessions started longer ago than this',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['max_age_hours'])
+        expired = 0
+        for pk in RecipeImageUpload.objects.filter(
+            created__lt=cutoff
+        ).values_list('pk', flat=True).iterator():
+            # Sessions being finalized are locked, leave them alone
+            with transaction.atomic():
+                upload = RecipeImageUpload.objects.select_for_update(
+                    skip_locked=True
+                ).filter(pk=pk).first()
+                if upload is not None:
+                    discard_upload(upload)
+                    expired += 1
+
+        orphans = self.remove_orphans(cutoff)
+        self.stdout.write(self.style.SUCCESS(
+            f'Expired {expired} upload sessions and {orphans} orphaned files'
+        ))
+
+    def remove_orphans(self, cutoff):
+        """Delete old partial files left behind without a session"""
+        directory = os.path.dirname(RecipeImageUpload().path)
+        if not os.path.isdir(directory):
+            return 0
+
+        sessions = {
+            f'{pk}.part' for pk in
+            RecipeImageUpload.objects.values_list('pk', flat=True)
+        }
+        removed = 0
+        for entry in os.scandir(directory):
+            if (entry.name not in sessions and entry.is_file()
+                    and entry.stat().st_mtime < cutoff.timestamp()):
+                os.remove(entry.path)
+                removed += 1
+
+        return removed
@@ -0,0 +1,253 @@
+import csv
+import io
+import json
+import os
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.models import (
+    ImportCheckpoint, Tag, Ingredient, Recipe
+)
+from recipe.export import CSV_LIST_SEPARATOR
+
+
+def read_ndjson(stream):
+    """Yield rows of a newline delimited JSON file"""
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(stream):
+    """Yield rows of a CSV file, splitting the tag and ingredient columns"""
+    for row in csv.DictReader(stream):
+        for field in ('tags', 'ingredients'):
+            value = row.get(field) or ''
+            row[field] = value.split(CSV_LIST_SEPARATOR) if value else []
+        yield row
+
+
+READERS = {'ndjson': read_ndjson, 'csv': read_csv}
+
+
+class Command(BaseCommand):
+    """Load recipes with their tags and ingredients from export files"""
+    help = 'Import recipes, tags and ingredients from NDJSON or CSV files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+')
+        parser.add_argument(
+            '--user',
+            help='Email of the owner of rows without a "user" column',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Use bulk inserts even when PostgreSQL COPY is available',
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Skip the rows committed by a previous, failed run',
+        )
+
+    def handle(self, *args, **options):
+        self.default_user = options['user']
+        self.use_copy = (
+            connection.vendor == 'postgresql' and not options['no_copy']
+        )
+        self.users = {}
+        self.names = {Tag: {}, Ingredient: {}}
+
+        started = time.monotonic()
+        total = 0
+        for path in options['files']:
+            total += self.import_file(
+                path, options['batch_size'], options['resume']
+            )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {total} recipes in {elapsed:.1f}s '
+            f'({total / elapsed if elapsed else 0:.0f} rows/s)'
+        ))
+
+    def import_file(self, path, batch_size, resume):
+        """Import a file batch by batch, checkpointing after each commit"""
+        extension = os.path.splitext(path)[1].lstrip('.').lower()
+        if extension not in READERS:
+            raise CommandError(f'{path}: unsupported file type')
+
+        checkpoint = os.path.abspath(path)
+        done = 0
+        if resume:
+            done = ImportCheckpoint.objects.filter(
+                path=checkpoint
+            ).values_list('rows', flat=True).first() or 0
+            self.stdout.write(f'{path}: resuming after row {done}')
+
+        started = time.monotonic()
+        imported = 0
+        with open(path, newline='') as stream:
+            rows = READERS[extension](stream)
+            for _ in range(done):
+                next(rows, None)
+
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == batch_size:
+                    done, imported = self.commit(
+                        batch, checkpoint, done, imported
+                    )
+                    batch = []
+                    self.report(path, done, imported, started)
+            if batch:
+                done, imported = self.commit(
+                    batch, checkpoint, done, imported
+                )
+                self.report(path, done, imported, started)
+
+        ImportCheckpoint.objects.filter(path=checkpoint).delete()
+        return imported
+
+    def commit(self, batch, checkpoint, done, imported):
+        """Import a batch and record the progress in one transaction"""
+        done += len(batch)
+        with transaction.atomic():
+            self.import_batch(batch)
+            ImportCheckpoint.objects.update_or_create(
+                path=checkpoint, defaults={'rows': done}
+            )
+
+        return done, imported + len(batch)
+
+    def report(self, path, done, imported, started):
+        """Print the progress of a file"""
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'{path}: {done} rows '
+            f'({imported / elapsed if elapsed else 0:.0f} rows/s)'
+        )
+
+    def resolve_users(self, rows):
+        """Return the owner id of each row"""
+        emails = [row.get('user') or self.default_user for row in rows]
+        if None in emails:
+            raise CommandError('Rows without a user need --user')
+
+        missing = set(emails) - set(self.users)
+        if missing:
+            self.users.update(get_user_model().objects.filter(
+                email__in=missing
+            ).values_list('email', 'id'))
+            unknown = missing - set(self.users)
+            if unknown:
+                raise CommandError(f'Unknown users: {sorted(unknown)}')
+
+        return [self.users[email] for email in emails]
+
+    def resolve_names(self, model, field, rows, user_ids):
+        """Return the related ids of each row, creating missing names"""
+        names = self.names[model]
+        missing = {}
+        for row, user_id in zip(rows, user_ids):
+            for name in row.get(field) or []:
+                if (user_id, name) not in names:
+                    missing.setdefault(user_id, set()).add(name)
+
+        for user_id, user_names in missing.items():
+            user = get_user_model()(pk=user_id)
+            for obj, _ in model.objects.get_or_create_many(user, user_names):
+                names[user_id, obj.name] = obj.id
+
+        return [
+            {names[user_id, name] for name in row.get(field) or []}
+            for row, user_id in zip(rows, user_ids)
+        ]
+
+    def import_batch(self, rows):
+        """Insert a batch of recipes and their tag and ingredient links"""
+        user_ids = self.resolve_users(rows)
+        tags = self.resolve_names(Tag, 'tags', rows, user_ids)
+        ingredients = self.resolve_names(
+            Ingredient, 'ingredients', rows, user_ids
+        )
+        recipes = [
+            Recipe(
+                user_id=user_id,
+                title=row['title'],
+                time_minutes=int(row['time_minutes']),
+                price=Decimal(row['price']),
+                link=row.get('link') or '',
+            )
+            for row, user_id in zip(rows, user_ids)
+        ]
+
+        if self.use_copy:
+            self.copy_recipes(recipes)
+        else:
+            Recipe.objects.bulk_create(recipes)
+
+        tag_links = [
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+            for recipe, tag_ids in zip(recipes, tags)
+            for tag_id in tag_ids
+        ]
+        ingredient_links = [
+            Recipe.ingredients.through(
+                recipe_id=recipe.id, ingredient_id=ingredient_id
+            )
+            for recipe, ingredient_ids in zip(recipes, ingredients)
+            for ingredient_id in ingredient_ids
+        ]
+        if not self.use_copy:
+            Recipe.objects.link_bulk(recipes, tag_links, ingredient_links)
+            return
+
+        for links, column in ((tag_links, 'tag_id'),
+                              (ingredient_links, 'ingredient_id')):
+            if links:
+                self.copy(
+                    links[0]._meta.db_table, ('recipe_id', column),
+                    ((link.recipe_id, getattr(link, column))
+                     for link in links)
+                )
+        Recipe.objects.bulk_linked(recipes, tag_links, ingredient_links)
+
+    def copy_recipes(self, recipes):
+        """COPY recipes, reserving their ids from the sequence first"""
+        table = Recipe._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+                'FROM generate_series(1, %s)',
+                [table, 'id', len(recipes)]
+            )
+            for recipe, (pk,) in zip(recipes, cursor.fetchall()):
+                recipe.id = pk
+
+        self.copy(
+            table,
+            ('id', 'user_id', 'title', 'time_minutes', 'price', 'link',
+             'image_status', 'image_renditions'),
+            ((recipe.id, recipe.user_id, recipe.title, recipe.time_minutes,
+              recipe.price, recipe.link, recipe.image_status,
+              json.dumps(recipe.image_renditions)) for recipe in recipes)
+        )
+
+    def copy(self, table, columns, rows):
+        """Load rows into table with PostgreSQL COPY"""
+        buffer = io.StringIO()
+        csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(rows)
+        buffer.seek(0)
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {quote(table)} ({", ".join(map(quote, columns))}) '
+                'FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Tag, Ingredient
+
+
+class Command(BaseCommand):
+    """Recompute the denormalized recipe counts of tags and ingredients"""
+    help = 'Fix tag and ingredient recipe counts that drifted from the links'
+
+    def handle(self, *args, **options):
+        for model in (Tag, Ingredient):
+            fixed = model.objects.recount_recipes()
+            self.stdout.write(
+                f'Fixed {fixed} {model._meta.verbose_name} recipe counts'
+            )
+        self.stdout.write(self.style.SUCCESS('Recipe counts are up to date'))
@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import Recipe
+from recipe.renditions import generate_renditions
+
+
+class Command(BaseCommand):
+    """Render recipe images whose background job was lost
+
+    Jobs queued in memory are dropped when their process restarts, leaving
+    the recipe pending forever.
+    """
+    help = 'Generate the renditions of recipe images stuck pending'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-minutes', type=int,
+            default=settings.RECIPE_IMAGE_REQUEUE_MINUTES,
+            help='Requeue images pending for longer than this',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(
+            minutes=options['older_than_minutes']
+        )
+        stuck = Recipe.objects.filter(
+            Q(image_queued__lt=cutoff) | Q(image_queued=None),
+            image_status=Recipe.ImageStatus.PENDING,
+        )
+        requeued = 0
+        for pk, image_name in stuck.values_list('pk', 'image').iterator():
+            # Claim the recipe, so concurrent runs render it only once
+            if not stuck.filter(pk=pk, image=image_name).update(
+                image_queued=timezone.now()
+            ):
+                continue
+
+            generate_renditions(pk, image_name)
+            requeued += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Requeued {requeued} pending recipe images'
+        ))
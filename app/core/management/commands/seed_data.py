@@ -0,0 +1,345 @@
+import io
+import itertools
+import multiprocessing
+import os
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+
+from core.models import Tag, Ingredient, Recipe
+
+
+TAG_WORDS = (
+    'vegan', 'quick', 'dinner', 'dessert', 'breakfast', 'healthy', 'spicy',
+    'vegetarian', 'lunch', 'comfort', 'baking', 'gluten free', 'italian',
+    'asian', 'mexican', 'soup', 'salad', 'party', 'summer', 'winter',
+)
+INGREDIENT_WORDS = (
+    'salt', 'olive oil', 'garlic', 'onion', 'butter', 'flour', 'sugar',
+    'egg', 'milk', 'pepper', 'tomato', 'lemon', 'chicken', 'rice', 'ginger',
+    'carrot', 'potato', 'cheese', 'basil', 'honey', 'beef', 'tofu', 'lentils',
+    'pasta', 'cream', 'chili', 'spinach', 'mushroom', 'yogurt', 'salmon',
+)
+TITLE_WORDS = TAG_WORDS + INGREDIENT_WORDS + (
+    'roast', 'stew', 'curry', 'pie', 'bowl', 'bake', 'fried', 'grilled',
+)
+
+# Set in each worker by init_worker, so the plan is only pickled once
+_plan = None
+
+
+def zipf_weights(count, skew):
+    """Return cumulative Zipf weights of count ranks"""
+    return list(itertools.accumulate(
+        1 / (rank + 1) ** skew for rank in range(count)
+    ))
+
+
+def rank_name(words, rank):
+    """Return a unique name for a popularity rank"""
+    name = words[rank % len(words)]
+    return f'{name} {rank // len(words)}' if rank >= len(words) else name
+
+
+def pick_ranks(rng, weights, count):
+    """Pick count distinct ranks, favouring the popular ones"""
+    total = len(weights)
+    if count * 2 >= total:
+        return rng.sample(range(total), min(count, total))
+    picked = set()
+    while len(picked) < count:
+        picked.update(rng.choices(
+            range(total), cum_weights=weights, k=count - len(picked)
+        ))
+    return picked
+
+
+def reserve_ids(model, count):
+    """Reserve a contiguous block of ids, returning the first one
+
+    Rows are then written with explicit ids, so workers never need to read
+    back what other workers inserted. Every id is drawn from the sequence,
+    so none is handed out twice. Inserts are locked out while drawing, and
+    a block interleaved with the draws of another session is abandoned.
+    """
+    if not count:
+        return 0
+    table = model._meta.db_table
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'LOCK TABLE {connection.ops.quote_name(table)} '
+                'IN EXCLUSIVE MODE'
+            )
+            cursor.execute(
+                'SELECT min(id), max(id) FROM ('
+                'SELECT nextval(pg_get_serial_sequence(%s, %s)) AS id '
+                'FROM generate_series(1, %s)) ids',
+                [table, 'id', count]
+            )
+            first, last = cursor.fetchone()
+        if last - first + 1 == count:
+            return first
+
+
+def copy_rows(table, columns, lines):
+    """Load tab separated lines into table with PostgreSQL COPY
+
+    Generated values never contain tabs or backslashes, so the text format
+    is used as is, which is cheaper to produce than CSV.
+    """
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {quote(table)} ({", ".join(map(quote, columns))}) '
+            'FROM STDIN',
+            io.StringIO(''.join(lines))
+        )
+
+
+def count_links(model, first_id, count):
+    """Set the recipe counts of a block of tags or ingredients
+
+    Only aggregates the links of the block, through the covering index on
+    the link table, instead of recounting the whole table.
+    """
+    field = model._meta.model_name
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    links = quote(model.recipe_set.through._meta.db_table)
+    column = quote(f'{field}_id')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET recipe_count = l.count '
+            f'FROM (SELECT {column} AS id, COUNT(*) AS count FROM {links} '
+            f'WHERE {column} BETWEEN %(first)s AND %(last)s '
+            f'GROUP BY {column}) l '
+            f'WHERE {table}.id = l.id',
+            {'first': first_id, 'last': first_id + count - 1}
+        )
+
+
+def init_worker(plan):
+    """Keep the plan in the worker"""
+    global _plan
+    _plan = plan
+
+
+def seed_chunk(chunk):
+    """Write a chunk of recipes and their links, returning the link count
+
+    Each chunk has its own random generator, so the data only depends on
+    the seed and not on the number of workers.
+    """
+    index, first_id, count = chunk
+    plan = _plan
+    rng = random.Random(f'{plan["seed"]}-{index}')
+    tags_per_user = plan['tags']
+    ingredients_per_user = plan['ingredients']
+
+    recipes, tag_links, ingredient_links = [], [], []
+    owners = rng.choices(
+        range(len(plan['users'])), cum_weights=plan['user_weights'], k=count
+    )
+    for recipe_id, owner in zip(range(first_id, first_id + count), owners):
+        recipes.append(
+            f'{recipe_id}\t{plan["users"][owner]}\t'
+            f'{" ".join(rng.sample(TITLE_WORDS, 3))}\t'
+            f'{rng.randint(5, 180)}\t{rng.randint(100, 9999) / 100}\t'
+            '\tnone\t{}\n'
+        )
+        for links, first, total, weights, mean in (
+            (tag_links, plan['first_tag'] + owner * tags_per_user,
+             tags_per_user, plan['tag_weights'], plan['tags_per_recipe']),
+            (ingredient_links,
+             plan['first_ingredient'] + owner * ingredients_per_user,
+             ingredients_per_user, plan['ingredient_weights'],
+             plan['ingredients_per_recipe']),
+        ):
+            if not total or not mean:
+                continue
+            for rank in pick_ranks(rng, weights, rng.randint(1, mean * 2 - 1)):
+                links.append(f'{recipe_id}\t{first + rank}\n')
+
+    with transaction.atomic():
+        # Losing the last chunks on a crash is fine for generated data
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL synchronous_commit = off')
+        copy_rows(
+            Recipe._meta.db_table,
+            ('id', 'user_id', 'title', 'time_minutes', 'price', 'link',
+             'image_status', 'image_renditions'),
+            recipes
+        )
+        copy_rows(
+            Recipe.tags.through._meta.db_table,
+            ('recipe_id', 'tag_id'), tag_links
+        )
+        copy_rows(
+            Recipe.ingredients.through._meta.db_table,
+            ('recipe_id', 'ingredient_id'), ingredient_links
+        )
+        Recipe.objects.update_search_vectors(
+            range(first_id, first_id + count)
+        )
+
+    return count, len(tag_links) + len(ingredient_links)
+
+
+class Command(BaseCommand):
+    """Generate synthetic users, recipes, tags and ingredients"""
+    help = 'Seed the database with skewed synthetic data for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=100000,
+                            help='Total number of recipes')
+        parser.add_argument('--tags', type=int, default=50,
+                            help='Tags per user')
+        parser.add_argument('--ingredients', type=int, default=200,
+                            help='Ingredients per user')
+        parser.add_argument('--tags-per-recipe', type=int, default=3,
+                            help='Average number of tags of a recipe')
+        parser.add_argument('--ingredients-per-recipe', type=int, default=7,
+                            help='Average number of ingredients of a recipe')
+        parser.add_argument(
+            '--tag-skew', type=float, default=1.1,
+            help='Zipf exponent of tag and ingredient popularity',
+        )
+        parser.add_argument(
+            '--user-skew', type=float, default=1.0,
+            help='Zipf exponent of the number of recipes per user',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Recipes written per transaction')
+        parser.add_argument('--password', default='seedPASS123')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('seed_data needs PostgreSQL COPY')
+        if options['users'] < 1:
+            raise CommandError('At least one user is needed')
+
+        started = time.monotonic()
+        user_ids = self.create_users(options)
+        plan = {
+            'seed': options['seed'],
+            'users': user_ids,
+            'user_weights': zipf_weights(len(user_ids), options['user_skew']),
+            'tags': options['tags'],
+            'ingredients': options['ingredients'],
+            'tags_per_recipe': options['tags_per_recipe'],
+            'ingredients_per_recipe': options['ingredients_per_recipe'],
+            'tag_weights': zipf_weights(options['tags'], options['tag_skew']),
+            'ingredient_weights': zipf_weights(
+                options['ingredients'], options['tag_skew']
+            ),
+            'first_tag': self.create_names(
+                Tag, TAG_WORDS, user_ids, options['tags']
+            ),
+            'first_ingredient': self.create_names(
+                Ingredient, INGREDIENT_WORDS, user_ids, options['ingredients']
+            ),
+        }
+
+        first_recipe = reserve_ids(Recipe, options['recipes'])
+        chunk_size = options['chunk_size']
+        chunks = [
+            (index, first_recipe + start,
+             min(chunk_size, options['recipes'] - start))
+            for index, start in enumerate(
+                range(0, options['recipes'], chunk_size)
+            )
+        ]
+        self.seed_recipes(plan, chunks, options['workers'], started)
+
+        # Links are written with COPY, which bypasses the count signals
+        count_links(Tag, plan['first_tag'], len(user_ids) * options['tags'])
+        count_links(
+            Ingredient, plan['first_ingredient'],
+            len(user_ids) * options['ingredients']
+        )
+        with connection.cursor() as cursor:
+            for model in (get_user_model(), Tag, Ingredient, Recipe,
+                          Recipe.tags.through, Recipe.ingredients.through):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(user_ids)} users and {options["recipes"]} recipes '
+            f'in {time.monotonic() - started:.1f}s'
+        ))
+
+    def create_users(self, options):
+        """Create the users, returning their ids"""
+        emails = [
+            f'seed-{options["seed"]}-{n}@example.com'
+            for n in range(options['users'])
+        ]
+        User = get_user_model()
+        if User.objects.filter(email=emails[0]).exists():
+            raise CommandError(
+                f'Data for seed {options["seed"]} exists, use another --seed'
+            )
+
+        # One hash shared by every user, hashing each would dominate
+        password = make_password(options['password'])
+        users = User.objects.bulk_create(
+            [User(email=email, username=email.split('@')[0],
+                  password=password) for email in emails],
+            batch_size=5000,
+        )
+        return [user.id for user in users]
+
+    def create_names(self, model, words, user_ids, count):
+        """Create count tags or ingredients per user, returning the first id
+
+        The objects of a user get consecutive ids by popularity rank, so a
+        rank maps to an id without any lookup.
+        """
+        first_id = reserve_ids(model, len(user_ids) * count)
+        names = [rank_name(words, rank) for rank in range(count)]
+        copy_rows(
+            model._meta.db_table, ('id', 'user_id', 'name', 'recipe_count'),
+            (f'{first_id + n * count + rank}\t{user_id}\t{name}\t0\n'
+             for n, user_id in enumerate(user_ids)
+             for rank, name in enumerate(names))
+        )
+        return first_id
+
+    def seed_recipes(self, plan, chunks, workers, started):
+        """Write the chunks, in worker processes when more than one"""
+        recipes = links = 0
+        if workers > 1 and len(chunks) > 1:
+            # Workers are forked, so they must not share our connections
+            connections.close_all()
+            pool = multiprocessing.get_context('fork').Pool(
+                min(workers, len(chunks)), init_worker, (plan,)
+            )
+            with pool:
+                results = pool.imap_unordered(seed_chunk, chunks)
+                for chunk_recipes, chunk_links in results:
+                    recipes += chunk_recipes
+                    links += chunk_links
+                    self.report(recipes, links, started)
+            return
+
+        init_worker(plan)
+        for chunk in chunks:
+            chunk_recipes, chunk_links = seed_chunk(chunk)
+            recipes += chunk_recipes
+            links += chunk_links
+            self.report(recipes, links, started)
+
+    def report(self, recipes, links, started):
+        """Print the progress"""
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'{recipes} recipes, {links} links '
+            f'({links / elapsed if elapsed else 0:.0f} links/s)'
+        )
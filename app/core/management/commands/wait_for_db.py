@@ -1,24 +1,44 @@
 import time
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.db.utils import OperationalError
-from django.db import connections
+
+from core.health import check_database
 
 
 class Command(BaseCommand):
     """Custom Django command to pause execution until database is available"""
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Give up after this many seconds',
+        )
+        parser.add_argument(
+            '--max-delay', type=float, default=5,
+            help='Longest pause between attempts, in seconds',
+        )
+
     def handle(self, *args, **options):
         self.stdout.write('Waiting for database...')
-        db_conn = None
-        while not db_conn:
+        deadline = time.monotonic() + options['timeout']
+        delay = 0.1
+        while True:
             try:
-                db_conn = connections['default']
+                check_database()
+                break
             except OperationalError:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(
+                        f'Database unavailable after {options["timeout"]}s'
+                    )
+                delay = min(delay, remaining)
                 self.stdout.write(
                     self.style.WARNING(
-                        'Database unavailable, waiting 1 second...'
-                        )
+                        f'Database unavailable, waiting {delay:.1f} seconds...'
                     )
-                time.sleep(1)
+                )
+                time.sleep(delay)
+                delay = min(delay * 2, options['max_delay'])
         self.stdout.write(self.style.SUCCESS('Database available!'))
@@ -0,0 +1,176 @@
+import heapq
+import itertools
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTiming:
+    """Queries and phase durations of a single request"""
+
+    def __init__(self, slowest_kept):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_ended = None
+        self.serializer_time = 0.0
+        self._serializing = 0
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest = []
+        self.slowest_kept = slowest_kept
+        self._order = itertools.count()
+
+    def __call__(self, execute, sql, params, many, context):
+        """Time a statement, used as a database execute wrapper"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries += 1
+            self.db_time += duration
+            entry = (duration, next(self._order), sql)
+            if len(self.slowest) < self.slowest_kept:
+                heapq.heappush(self.slowest, entry)
+            elif self.slowest_kept:
+                heapq.heappushpop(self.slowest, entry)
+
+    @contextmanager
+    def serializing(self):
+        """Count the time spent inside as serialization
+
+        Only the outermost block counts, so nested serializers are not
+        counted twice.
+        """
+        start = time.perf_counter()
+        self._serializing += 1
+        try:
+            yield
+        finally:
+            self._serializing -= 1
+            if not self._serializing:
+                self.serializer_time += time.perf_counter() - start
+
+    def phases(self, ended):
+        """Return the duration of each phase in milliseconds"""
+        phases = {'db': self.db_time}
+        if self.view_started is not None:
+            # Serializers run inside the view, rendering after it
+            view_ended = self.view_ended or ended
+            phases['view'] = (
+                view_ended - self.view_started - self.serializer_time
+            )
+            phases['serialize'] = self.serializer_time + ended - view_ended
+        phases['total'] = ended - self.started
+
+        return {name: duration * 1000 for name, duration in phases.items()}
+
+
+_timed_serializers = {}
+
+
+def timed_serializer(serializer_class):
+    """Return a subclass of serializer_class reporting its output time
+
+    The time to_representation takes counts as serialization in the timing
+    of the request found in the serializer context.
+    """
+    timed = _timed_serializers.get(serializer_class)
+    if timed is None:
+        class TimedSerializer(serializer_class):
+
+            def to_representation(self, instance):
+                timing = getattr(self.context.get('request'), 'timing', None)
+                if timing is None:
+                    return super().to_representation(instance)
+                with timing.serializing():
+                    return super().to_representation(instance)
+
+        TimedSerializer.__name__ = serializer_class.__name__
+        TimedSerializer.__qualname__ = serializer_class.__qualname__
+        timed = _timed_serializers[serializer_class] = TimedSerializer
+
+    return timed
+
+
+class SerializerTimingMixin:
+    """Report the time serializers spend building response data
+
+    Views building serializers other than through get_serializer wrap
+    their class with timed_serializer.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer_class = timed_serializer(self.get_serializer_class())
+        kwargs.setdefault('context', self.get_serializer_context())
+        return serializer_class(*args, **kwargs)
+
+
+class RequestTimingMiddleware:
+    """Report the database, view and serialization time of each request
+
+    Serialization covers building serializer data in views using
+    SerializerTimingMixin, and rendering the response. Adds a Server-Timing
+    header and logs requests slower than REQUEST_TIMING_SLOW_MS, or issuing
+    more than REQUEST_TIMING_SLOW_QUERIES statements, with their slowest
+    SQL. Streaming responses are left out, as their content is produced
+    after the middleware returns. Must be the last middleware, so that
+    the view starts right after process_view and the response is rendered
+    right after process_template_response. Unless REQUEST_TIMING is set the
+    middleware removes itself from the chain when it is loaded.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = request.timing = RequestTiming(
+            settings.REQUEST_TIMING_LOGGED_QUERIES
+        )
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timing))
+            response = self.get_response(request)
+        if response.streaming:
+            return response
+        phases = timing.phases(time.perf_counter())
+
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration:.1f}' + (
+                f';desc="{timing.queries} queries"' if name == 'db' else ''
+            )
+            for name, duration in phases.items()
+        )
+        if (phases['total'] >= settings.REQUEST_TIMING_SLOW_MS
+                or timing.queries > settings.REQUEST_TIMING_SLOW_QUERIES):
+            self.log_slow(request, response, timing, phases)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.timing.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        request.timing.view_ended = time.perf_counter()
+        return response
+
+    def log_slow(self, request, response, timing, phases):
+        """Log a slow request with its slowest statements"""
+        logger.warning(
+            'Slow request %s %s (%s): %.1fms, %d queries in %.1fms%s',
+            request.method, request.path, response.status_code,
+            phases['total'], timing.queries, phases['db'],
+            ''.join(
+                f'\n  {duration * 1000:.1f}ms {sql}'
+                for duration, _, sql in sorted(timing.slowest, reverse=True)
+            ),
+        )
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.12 on 2026-10-17 04:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_cursor_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeAttrVersion',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='core.customuser')),
+                ('tag', models.PositiveBigIntegerField(default=0)),
+                ('ingredient', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
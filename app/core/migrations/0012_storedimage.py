@@ -0,0 +1,46 @@
+# Generated by Django 3.2.12 on 2026-10-17 04:43
+
+import core.models
+import core.storage
+from django.db import migrations, models
+from django.db.models import Count
+import django.utils.timezone
+
+
+def count_existing_images(apps, schema_editor):
+    """Create reference counts for the images recipes already use"""
+    Recipe = apps.get_model('core', 'Recipe')
+    StoredImage = apps.get_model('core', 'StoredImage')
+    counts = Recipe.objects.exclude(image='').exclude(image=None).values(
+        'image').annotate(count=Count('id'))
+    StoredImage.objects.bulk_create([
+        StoredImage(name=row['image'], refcount=row['count'])
+        for row in counts
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipeimageupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('refcount', models.IntegerField(default=0)),
+                ('updated', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(null=True, storage=core.storage.get_recipe_image_storage, upload_to=core.models.recipe_image_file_path),
+        ),
+        migrations.RunPython(
+            count_existing_images, migrations.RunPython.noop
+        ),
+    ]
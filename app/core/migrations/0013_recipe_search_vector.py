@@ -0,0 +1,44 @@
+# Generated by Django 3.2.12 on 2026-10-17 04:49
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+BACKFILL_SEARCH_VECTOR = """
+UPDATE core_recipe r SET search_vector =
+    setweight(to_tsvector(%(config)s::regconfig, r.title), 'A')
+    || setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(t.name, ' ') FROM core_tag t
+        JOIN core_recipe_tags l ON l.tag_id = t.id
+        WHERE l.recipe_id = r.id
+    ), '')), 'B')
+    || setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(i.name, ' ') FROM core_ingredient i
+        JOIN core_recipe_ingredients l ON l.ingredient_id = i.id
+        WHERE l.recipe_id = r.id
+    ), '')), 'C')
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_storedimage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            [(BACKFILL_SEARCH_VECTOR, {'config': settings.RECIPE_SEARCH_CONFIG})],
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='core_recipe_search__c01407_gin'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.12 on 2026-10-17 04:58
+
+from django.db import migrations, models
+
+
+COUNT_RECIPES = """
+UPDATE core_{field} a SET recipe_count = (
+    SELECT count(*) FROM core_recipe_{field}s l WHERE l.{field}_id = a.id
+)
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_recipe_link_covering_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(
+            COUNT_RECIPES.format(field='tag'), migrations.RunSQL.noop
+        ),
+        migrations.RunSQL(
+            COUNT_RECIPES.format(field='ingredient'), migrations.RunSQL.noop
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.12 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_queued',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+    ]
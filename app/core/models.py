@@ -1,12 +1,21 @@
-from django.db import models
+from django.db import connections, models, router
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import (
                                         AbstractBaseUser, PermissionsMixin,
                                         UserManager)
 from django.contrib.auth.hashers import make_password
+from django.utils import timezone
 from django.conf import settings
 
 import uuid
 import os
+from collections import Counter
+
+from .hashing import hashing_pool
+from .storage import get_recipe_image_storage
 
 
 def recipe_image_file_path(instance, filename):
@@ -24,7 +33,7 @@ class CustomUserManager(UserManager):
         if not email:
             raise ValueError('You must provide an email address')
         user = self.model(email=self.normalize_email(email), **extra_fields)
-        user.password = make_password(password)
+        user.password = hashing_pool.run(make_password, password)
         user.save(using=self._db)
         return user
 
@@ -51,6 +60,87 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
+class RecipeAttrManager(models.Manager):
+
+    def get_or_create_many(self, user, names):
+        """Return (object, created) pairs for names, creating missing ones
+
+        Inserts the names skipping existing ones, which are selected in the
+        same statement, so existing rows are neither rewritten nor locked.
+        Names are inserted in sorted order so concurrent batches wait on
+        each other in the same order and cannot deadlock.
+        """
+        missing = sorted(set(names))
+        if not missing:
+            return []
+
+        connection = connections[router.db_for_write(self.model)]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        found = {}
+        created = set()
+        with connection.cursor() as cursor:
+            # Rows committed concurrently are not visible to the statement
+            # that skipped them, the next one selects them
+            while missing:
+                cursor.execute(
+                    f'WITH inserted AS ('
+                    f'INSERT INTO {table} (user_id, name, recipe_count) '
+                    'SELECT %(user)s, unnest(%(names)s::varchar[]), 0 '
+                    'ON CONFLICT (user_id, name) DO NOTHING '
+                    'RETURNING id, name) '
+                    'SELECT id, name, true FROM inserted UNION ALL '
+                    f'SELECT id, name, false FROM {table} '
+                    'WHERE user_id = %(user)s '
+                    'AND name = ANY(%(names)s::varchar[])',
+                    {'user': user.pk, 'names': missing}
+                )
+                for pk, name, inserted in cursor.fetchall():
+                    found[name] = pk
+                    if inserted:
+                        created.add(name)
+                missing = [name for name in missing if name not in found]
+
+        if created:
+            RecipeAttrVersion.objects.bump(
+                user.pk, self.model._meta.model_name
+            )
+
+        return [
+            (self.model(id=found[name], name=name, user=user),
+             name in created)
+            for name in sorted(found)
+        ]
+
+    def adjust_recipe_counts(self, deltas):
+        """Add to the recipe counts, given as a mapping of id to delta
+
+        Objects sharing a delta are updated together, so the common cases
+        of adding or removing one link each take a single query.
+        """
+        ids_by_delta = {}
+        for pk, delta in deltas.items():
+            if delta:
+                ids_by_delta.setdefault(delta, []).append(pk)
+
+        for delta, ids in ids_by_delta.items():
+            self.filter(id__in=ids).update(
+                recipe_count=F('recipe_count') + delta
+            )
+
+    def recount_recipes(self):
+        """Recompute drifted recipe counts, returning how many changed"""
+        field = self.model._meta.model_name
+        actual = Coalesce(Subquery(
+            self.model.recipe_set.through.objects.filter(
+                **{f'{field}_id': OuterRef('pk')}
+            ).values(f'{field}_id').annotate(
+                count=Count('*')
+            ).values('count')
+        ), 0)
+
+        return self.exclude(recipe_count=actual).update(recipe_count=actual)
+
+
 class Tag(models.Model):
     """Tag model for creating recipe tags"""
     user = models.ForeignKey(
@@ -58,6 +148,17 @@ class Tag(models.Model):
         on_delete=models.CASCADE,
     )
     name = models.CharField(max_length=255)
+    recipe_count = models.IntegerField(default=0, editable=False)
+
+    objects = RecipeAttrManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_%(class)s_name_per_user',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -70,13 +171,95 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE,
     )
     name = models.CharField(max_length=255)
+    recipe_count = models.IntegerField(default=0, editable=False)
+
+    objects = RecipeAttrManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_%(class)s_name_per_user',
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class RecipeManager(models.Manager):
+
+    def link_bulk(self, recipes, tag_links, ingredient_links,
+                  batch_size=None):
+        """Insert the links of bulk created recipes, see bulk_linked"""
+        self.model.tags.through.objects.bulk_create(
+            tag_links, batch_size=batch_size
+        )
+        self.model.ingredients.through.objects.bulk_create(
+            ingredient_links, batch_size=batch_size
+        )
+        self.bulk_linked(recipes, tag_links, ingredient_links)
+
+    def bulk_linked(self, recipes, tag_links, ingredient_links):
+        """Update what signals maintain, after bulk inserts bypassing them
+
+        Bumps the tag and ingredient list versions of the owners, indexes
+        the recipes for search and counts the links on tags and ingredients.
+        """
+        for user_id in {recipe.user_id for recipe in recipes}:
+            RecipeAttrVersion.objects.bump(user_id, 'tag', 'ingredient')
+        self.update_search_vectors(recipe.id for recipe in recipes)
+        Tag.objects.adjust_recipe_counts(
+            Counter(link.tag_id for link in tag_links)
+        )
+        Ingredient.objects.adjust_recipe_counts(
+            Counter(link.ingredient_id for link in ingredient_links)
+        )
+
+    def update_search_vectors(self, ids):
+        """Recompute the search vector of the recipes with the given ids
+
+        Titles weigh more than tag names, which weigh more than ingredient
+        names. Called from signals and after bulk inserts, which bypass them.
+        """
+        ids = list(ids)
+        if not ids:
+            return
+
+        connection = connections[router.db_for_write(self.model)]
+        quote = connection.ops.quote_name
+        terms = []
+        for field, weight in (('tags', 'B'), ('ingredients', 'C')):
+            related = self.model._meta.get_field(field)
+            terms.append(
+                f"setweight(to_tsvector(%(config)s::regconfig, coalesce(("
+                f"SELECT string_agg(a.name, ' ') "
+                f"FROM {quote(related.related_model._meta.db_table)} a "
+                f"JOIN {quote(related.remote_field.through._meta.db_table)} "
+                f"l ON l.{quote(related.m2m_reverse_name())} = a.id "
+                f"WHERE l.{quote(related.m2m_column_name())} = r.id"
+                f"), '')), '{weight}')"
+            )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {quote(self.model._meta.db_table)} r '
+                'SET search_vector = '
+                "setweight(to_tsvector(%(config)s::regconfig, r.title), 'A')"
+                f' || {terms[0]} || {terms[1]} '
+                'WHERE r.id = ANY(%(ids)s)',
+                {'config': settings.RECIPE_SEARCH_CONFIG, 'ids': ids}
+            )
+
+
 class Recipe(models.Model):
     """The Recipe model"""
+
+    class ImageStatus(models.TextChoices):
+        NONE = 'none'
+        PENDING = 'pending'
+        READY = 'ready'
+        FAILED = 'failed'
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -87,7 +270,133 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path,
+        storage=get_recipe_image_storage,
+    )
+    image_status = models.CharField(
+        max_length=10,
+        choices=ImageStatus.choices,
+        default=ImageStatus.NONE,
+    )
+    image_renditions = models.JSONField(default=dict, blank=True)
+    # When the pending renditions were queued, see requeue_renditions
+    image_queued = models.DateTimeField(null=True, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id']),
+            GinIndex(fields=['search_vector']),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class StoredImageManager(models.Manager):
+
+    def reserve(self, name):
+        """Lock the row of a stored image, creating it if needed
+
+        Marks it as just used, so collect_images leaves the file alone
+        until the new reference is recorded. Call in a transaction.
+        """
+        while not self.filter(name=name).update(updated=timezone.now()):
+            self.get_or_create(name=name)
+
+    def acquire(self, name):
+        """Record a new reference to a stored image"""
+        self.get_or_create(name=name)
+        self.filter(name=name).update(
+            refcount=F('refcount') + 1, updated=timezone.now()
+        )
+
+    def release(self, name):
+        """Drop a reference to a stored image"""
+        self.filter(name=name).update(
+            refcount=F('refcount') - 1, updated=timezone.now()
+        )
+
+
+class StoredImage(models.Model):
+    """Reference count of a content addressed recipe image file"""
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.IntegerField(default=0)
+    updated = models.DateTimeField(default=timezone.now)
+
+    objects = StoredImageManager()
+
+    def __str__(self):
+        return self.name
+
+
+class RecipeImageUpload(models.Model):
+    """Resumable upload of a recipe image, received in chunks"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    recipe = models.ForeignKey('Recipe', on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    offset = models.PositiveBigIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def path(self):
+        """Return the path of the partially received file"""
+        return os.path.join(
+            settings.RECIPE_UPLOAD_PARTIAL_ROOT, f'{self.id}.part'
+        )
+
+
+class ImportCheckpoint(models.Model):
+    """Number of rows of an import file committed so far
+
+    Updated in the transaction of each imported batch, so a resumed import
+    never skips or repeats rows.
+    """
+    path = models.CharField(max_length=1024, unique=True)
+    rows = models.PositiveBigIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.path}: {self.rows}'
+
+
+class RecipeAttrVersionManager(models.Manager):
+
+    def current(self, user, field):
+        """Return the current version of a user's tag or ingredient list
+
+        Read from the database the list is read from, so a lagging replica
+        never pairs old rows with a newer version. Returns None when the
+        replica has no version for the user yet.
+        """
+        version = self.filter(user=user).values_list(field, flat=True).first()
+        if version is None and (router.db_for_read(self.model)
+                                == router.db_for_write(self.model)):
+            version = getattr(self.get_or_create(user=user)[0], field)
+
+        return version
+
+    def bump(self, user_id, *fields):
+        """Invalidate the given lists of a user"""
+        self.filter(user_id=user_id).update(
+            **{field: F(field) + 1 for field in fields}
+        )
+
+
+class RecipeAttrVersion(models.Model):
+    """Per user version counters of the tag and ingredient lists"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+    tag = models.PositiveBigIntegerField(default=0)
+    ingredient = models.PositiveBigIntegerField(default=0)
+
+    objects = RecipeAttrVersionManager()
@@ -0,0 +1,92 @@
+import contextvars
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import OperationalError
+
+
+PIN_COOKIE = 'replica_pin'
+
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+_down_until = {}
+_down_lock = threading.Lock()
+
+
+def pin_to_primary(response, user_id):
+    """Read the user's data from the primary for REPLICA_PIN_SECONDS
+
+    The pin is a signed cookie, so it follows the client to every worker
+    without any lookup on the server.
+    """
+    response.set_signed_cookie(
+        PIN_COOKIE, str(user_id), salt=PIN_COOKIE,
+        max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+    )
+
+
+def is_pinned(request, user_id):
+    """Return whether the user wrote recently enough to skip replicas"""
+    return request.get_signed_cookie(
+        PIN_COOKIE, default=None, salt=PIN_COOKIE,
+        max_age=settings.REPLICA_PIN_SECONDS,
+    ) == str(user_id)
+
+
+def _replica_usable(alias):
+    """Return whether a replica accepts connections, remembering failures"""
+    with _down_lock:
+        if _down_until.get(alias, 0) > time.monotonic():
+            return False
+    try:
+        connections[alias].ensure_connection()
+        return True
+    except OperationalError:
+        with _down_lock:
+            _down_until[alias] = (
+                time.monotonic() + settings.REPLICA_RETRY_SECONDS
+            )
+        return False
+
+
+def choose_replica():
+    """Return a usable replica alias, or None to read from the primary"""
+    replicas = list(settings.DATABASE_REPLICAS)
+    random.shuffle(replicas)
+    for alias in replicas:
+        if _replica_usable(alias):
+            return alias
+
+    return None
+
+
+def set_read_alias(alias):
+    """Route the reads of the current context, returning a reset token"""
+    return _read_alias.set(alias)
+
+
+def reset_read_alias(token):
+    """Restore the routing in place before set_read_alias"""
+    _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """Send reads to the replica chosen for the current request
+
+    Requests opt in by setting a read alias, see ReplicaReadMixin in
+    recipe.views. Everything else, and every write, uses the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
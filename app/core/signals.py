@@ -0,0 +1,195 @@
+from collections import Counter
+
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_init, post_save, pre_delete
+)
+from django.conf import settings
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .models import (
+    Tag, Ingredient, Recipe, RecipeAttrVersion, StoredImage
+)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_attr_version(sender, instance, **kwargs):
+    """Invalidate the list a tag or ingredient belongs to"""
+    RecipeAttrVersion.objects.bump(
+        instance.user_id, sender._meta.model_name
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_assigned_version(sender, instance, action, **kwargs):
+    """Invalidate the assigned lists when recipe links change"""
+    if action.startswith('post_'):
+        field = 'tag' if sender is Recipe.tags.through else 'ingredient'
+        RecipeAttrVersion.objects.bump(instance.user_id, field)
+
+
+@receiver(post_delete, sender=Recipe)
+def bump_recipe_versions(sender, instance, **kwargs):
+    """Invalidate the assigned lists when a recipe is removed"""
+    RecipeAttrVersion.objects.bump(instance.user_id, 'tag', 'ingredient')
+
+
+def _linked_recipe_ids(instance):
+    """Return the ids of the recipes linked to a tag or ingredient"""
+    field = instance._meta.model_name
+    return list(
+        getattr(Recipe, f'{field}s').through.objects.filter(
+            **{f'{field}_id': instance.pk}
+        ).values_list('recipe_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, update_fields, **kwargs):
+    """Reindex a recipe whose title may have changed"""
+    if update_fields is None or 'title' in update_fields:
+        Recipe.objects.update_search_vectors([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_linked_search_vectors(sender, instance, action, reverse, pk_set,
+                                 **kwargs):
+    """Reindex recipes whose tags or ingredients changed"""
+    if reverse and action == 'pre_clear':
+        instance._search_recipe_ids = _linked_recipe_ids(instance)
+    if not action.startswith('post_'):
+        return
+
+    if not reverse:
+        ids = [instance.pk]
+    elif action == 'post_clear':
+        ids = instance._search_recipe_ids
+    else:
+        ids = pk_set
+    Recipe.objects.update_search_vectors(ids)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def update_renamed_search_vectors(sender, instance, created, **kwargs):
+    """Reindex the recipes of a renamed tag or ingredient"""
+    if not created:
+        Recipe.objects.update_search_vectors(_linked_recipe_ids(instance))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_linked_recipes(sender, instance, **kwargs):
+    """Keep the recipes of a tag or ingredient before its links go"""
+    instance._search_recipe_ids = _linked_recipe_ids(instance)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def update_unlinked_search_vectors(sender, instance, **kwargs):
+    """Reindex the recipes of a deleted tag or ingredient"""
+    Recipe.objects.update_search_vectors(
+        getattr(instance, '_search_recipe_ids', [])
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def count_recipe_links(sender, instance, action, reverse, model, pk_set,
+                       **kwargs):
+    """Keep the recipe counts of tags and ingredients in step with links
+
+    Removals are counted before the links are deleted, since Django
+    reports every requested id whether or not it was linked.
+    """
+    field = 'tag' if sender is Recipe.tags.through else 'ingredient'
+    attr_model = type(instance) if reverse else model
+    own, other = (f'{field}_id', 'recipe_id') if reverse else (
+        'recipe_id', f'{field}_id')
+
+    if action == 'post_add' and reverse:
+        deltas = {instance.pk: len(pk_set)}
+    elif action == 'post_add':
+        deltas = dict.fromkeys(pk_set, 1)
+    elif action in ('pre_remove', 'pre_clear'):
+        links = sender.objects.filter(**{own: instance.pk})
+        if action == 'pre_remove':
+            links = links.filter(**{f'{other}__in': pk_set})
+        deltas = {
+            pk: -count for pk, count in Counter(
+                links.values_list(f'{field}_id', flat=True)
+            ).items()
+        }
+    else:
+        return
+
+    attr_model.objects.adjust_recipe_counts(deltas)
+
+
+@receiver(pre_delete, sender=Recipe)
+def uncount_deleted_recipe(sender, instance, **kwargs):
+    """Drop a deleted recipe from its tag and ingredient counts"""
+    for attr_model in (Tag, Ingredient):
+        field = attr_model._meta.model_name
+        links = getattr(Recipe, f'{field}s').through.objects.filter(
+            recipe_id=instance.pk
+        )
+        attr_model.objects.adjust_recipe_counts(
+            dict.fromkeys(links.values_list(f'{field}_id', flat=True), -1)
+        )
+
+
+DEFERRED = object()
+
+
+def _image_name(instance):
+    """Return the stored image name without loading a deferred field"""
+    if 'image' not in instance.__dict__:
+        return DEFERRED
+    image = instance.__dict__['image']
+    return getattr(image, 'name', image) or None
+
+
+@receiver(post_init, sender=Recipe)
+def remember_recipe_image(sender, instance, **kwargs):
+    """Keep the loaded image name to detect replacements"""
+    instance._stored_image = _image_name(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def count_recipe_image(sender, instance, **kwargs):
+    """Move the image reference when a recipe image is replaced"""
+    old, new = instance._stored_image, _image_name(instance)
+    if old is DEFERRED or new is DEFERRED or old == new:
+        return
+    if new:
+        StoredImage.objects.acquire(new)
+    if old:
+        StoredImage.objects.release(old)
+    instance._stored_image = new
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_image(sender, instance, **kwargs):
+    """Drop the image reference of a deleted recipe"""
+    name = _image_name(instance)
+    if name and name is not DEFERRED:
+        StoredImage.objects.release(name)
+
+
+@receiver(post_delete, sender=Token)
+def evict_cached_token(sender, instance, **kwargs):
+    """Stop accepting a deleted token"""
+    token_cache.delete(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def evict_cached_user_tokens(sender, instance, **kwargs):
+    """Reload users on their next request after any change"""
+    token_cache.delete_user(instance.pk)
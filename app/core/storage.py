@@ -0,0 +1,55 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage naming files after the SHA-256 of their content
+
+    Identical uploads map to the same name, so their bytes are stored once
+    and a re-upload stops after hashing. Only the directory and extension
+    of the requested name are kept. Saving locks the StoredImage row of the
+    name, so collect_images cannot delete the file being reused.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Same name means same content, and the row lock rules out a
+        # concurrent writer, so the name never needs a suffix
+        return name
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+
+        digest = digest.hexdigest()
+        name = os.path.join(
+            os.path.dirname(name),
+            digest[:2],
+            digest + os.path.splitext(name)[1].lower(),
+        )
+        from .models import StoredImage
+
+        with transaction.atomic():
+            StoredImage.objects.reserve(name)
+            if self.exists(name):
+                return name
+
+            return super().save(name, content, max_length=max_length)
+
+
+recipe_image_storage = ContentAddressedStorage()
+
+
+def get_recipe_image_storage():
+    """Return the storage of recipe images"""
+    return recipe_image_storage
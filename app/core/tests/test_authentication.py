@@ -0,0 +1,127 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import TokenCache, token_cache
+
+
+PROFILE_URL = reverse('users:profile')
+
+
+class TokenCacheTests(TestCase):
+    """Test the bounded token cache"""
+
+    def test_least_recently_used_evicted(self):
+        """Test that the least recently used entry is evicted when full"""
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set('a', 1, cache.generation)
+        cache.set('b', 2, cache.generation)
+        cache.get('a')
+        cache.set('c', 3, cache.generation)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_expired_entry_missing(self):
+        """Test that expired entries are not returned"""
+        cache = TokenCache(max_size=2, ttl=0)
+        cache.set('a', 1, cache.generation)
+
+        self.assertIsNone(cache.get('a'))
+
+    def test_stale_set_ignored(self):
+        """Test that a value loaded before an invalidation is not cached"""
+        cache = TokenCache(max_size=2, ttl=60)
+        generation = cache.generation
+        cache.delete('a')
+        cache.set('a', 1, generation)
+
+        self.assertIsNone(cache.get('a'))
+
+    def test_delete_user_evicts_only_their_tokens(self):
+        """Test that a user's tokens are evicted and others kept"""
+        cache = TokenCache(max_size=3, ttl=60)
+        cache.set('a', 1, cache.generation, user_pk=1)
+        cache.set('b', 2, cache.generation, user_pk=1)
+        cache.set('c', 3, cache.generation, user_pk=2)
+
+        cache.delete_user(1)
+
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache._user_keys, {2: {'c'}})
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating with cached tokens"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@email.com',
+            password='testPASS123',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def tearDown(self):
+        token_cache.clear()
+
+    def test_repeat_request_skips_database(self):
+        """Test that a repeat caller is authenticated without queries"""
+        self.client.get(PROFILE_URL)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(PROFILE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], self.user.email)
+
+    def test_deleted_token_rejected(self):
+        """Test that a deleted token stops working immediately"""
+        self.client.get(PROFILE_URL)
+        self.token.delete()
+
+        response = self.client.get(PROFILE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test that a deactivated user is rejected immediately"""
+        self.client.get(PROFILE_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(PROFILE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_reloads_user(self):
+        """Test that a password change evicts the cached user"""
+        self.client.get(PROFILE_URL)
+        self.user.set_password('newPASS456')
+        self.user.save()
+
+        with self.assertNumQueries(1):
+            response = self.client.get(PROFILE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_unsafe_request_checks_database(self):
+        """Test that writes see a deactivation made by another process"""
+        self.client.get(PROFILE_URL)
+        # A queryset update sends no signal, like a change in another process
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            is_active=False
+        )
+
+        response = self.client.patch(PROFILE_URL, {'name': 'New name'})
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -1,22 +1,409 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Count, F, Sum
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core.management.commands.seed_data import TAG_WORDS, reserve_ids
+from core.management.commands.import_recipes import Command as Importer
+from core.models import (
+    ImportCheckpoint, Ingredient, Recipe, RecipeImageUpload, Tag
+)
+from recipe.uploads import start_upload
 
 
 class TestCommands(TestCase):
 
     def test_wait_for_db_ready(self):
         """Test waiting for db when db is available"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+        with patch('core.management.commands.wait_for_db.check_database') \
+                as check:
+            call_command('wait_for_db', stdout=StringIO())
+            self.assertEqual(check.call_count, 1)
 
     @patch('time.sleep', return_value=True)
     def test_wait_for_db(self, ts):
-        """Testing waiting for db"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError()] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+        """Testing waiting for db with exponential backoff"""
+        with patch('core.management.commands.wait_for_db.check_database') \
+                as check:
+            check.side_effect = [OperationalError()] * 6 + [None]
+            call_command('wait_for_db', max_delay=1, stdout=StringIO())
+            self.assertEqual(check.call_count, 7)
+
+        self.assertEqual(
+            [round(call.args[0], 1) for call in ts.call_args_list],
+            [0.1, 0.2, 0.4, 0.8, 1.0, 1.0]
+        )
+
+    def test_wait_for_db_deadline(self):
+        """Test giving up once the database stays unavailable too long"""
+        with patch('core.management.commands.wait_for_db.check_database') \
+                as check:
+            check.side_effect = OperationalError()
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=0, stdout=StringIO())
+
+    def test_benchmark_recipe_create(self):
+        """Test the recipe creation benchmark reports and cleans up"""
+        out = StringIO()
+        call_command('benchmark_recipe_create', count=3, stdout=out)
+
+        self.assertIn('per-item: 3 recipes', out.getvalue())
+        self.assertIn('bulk: 3 recipes', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_repair_recipe_counts(self):
+        """Test that drifted recipe counts are recomputed"""
+        user = get_user_model().objects.create_user(email='user@email.com')
+        tag = Tag.objects.create(user=user, name='Vegan')
+        unused = Tag.objects.create(user=user, name='Dessert')
+        recipe = Recipe.objects.create(
+            user=user, title='Cake', time_minutes=5, price=1.00
+        )
+        recipe.tags.add(tag)
+        Tag.objects.update(recipe_count=7)
+        out = StringIO()
+
+        call_command('repair_recipe_counts', stdout=out)
+
+        tag.refresh_from_db()
+        unused.refresh_from_db()
+        self.assertEqual((tag.recipe_count, unused.recipe_count), (1, 0))
+        self.assertIn('Fixed 2 tag recipe counts', out.getvalue())
+
+    def test_expire_uploads(self):
+        """Test that abandoned uploads and orphaned files are deleted"""
+        user = get_user_model().objects.create_user(email='user@email.com')
+        recipe = Recipe.objects.create(
+            user=user, title='Cake', time_minutes=5, price=1.00
+        )
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root):
+            old, recent = [
+                RecipeImageUpload.objects.create(
+                    recipe=recipe, filename='photo.jpg', size=10,
+                    sha256='0' * 64
+                ) for _ in range(2)
+            ]
+            for upload in (old, recent):
+                start_upload(upload)
+            RecipeImageUpload.objects.filter(pk=old.pk).update(
+                created=timezone.now() - timedelta(days=2)
+            )
+            orphan = os.path.join(os.path.dirname(old.path), 'lost.part')
+            open(orphan, 'wb').close()
+            os.utime(orphan, (0, 0))
+            out = StringIO()
+
+            call_command('expire_uploads', stdout=out)
+
+            self.assertEqual(
+                list(RecipeImageUpload.objects.all()), [recent]
+            )
+            self.assertFalse(os.path.exists(old.path))
+            self.assertFalse(os.path.exists(orphan))
+            self.assertTrue(os.path.exists(recent.path))
+        self.assertIn(
+            'Expired 1 upload sessions and 1 orphaned files', out.getvalue()
+        )
+
+    @patch('core.management.commands.requeue_renditions'
+           '.generate_renditions')
+    def test_requeue_renditions(self, generate):
+        """Test that only images pending past the timeout are rendered"""
+        user = get_user_model().objects.create_user(email='user@email.com')
+        stuck, recent = [
+            Recipe.objects.create(
+                user=user, title=title, time_minutes=5, price=1.00,
+                image=f'uploads/recipe/{title}.jpg',
+                image_status=Recipe.ImageStatus.PENDING,
+                image_queued=timezone.now() - timedelta(minutes=minutes),
+            ) for title, minutes in (('stuck', 60), ('recent', 1))
+        ]
+        out = StringIO()
+
+        call_command('requeue_renditions', stdout=out)
+
+        generate.assert_called_once_with(stuck.pk, stuck.image.name)
+        stuck.refresh_from_db()
+        self.assertGreater(stuck.image_queued, recent.image_queued)
+        self.assertIn('Requeued 1 pending recipe images', out.getvalue())
+
+
+class BenchmarkEndpointsCommandTests(TransactionTestCase):
+    """Test benchmarking the endpoints on a throwaway database"""
+
+    def setUp(self):
+        self.database_name = connection.settings_dict['NAME']
+
+    def test_benchmark_endpoints_baseline(self):
+        """Test that endpoint benchmarks are saved and compared"""
+        options = {
+            'users': 1, 'recipes': 3, 'tags': 3, 'ingredients': 5,
+            'requests': 2, 'endpoint': ['recipe-list', 'recipe-retrieve'],
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, 'baseline.json')
+            call_command('benchmark_endpoints', baseline=baseline,
+                         save_baseline=True, stdout=StringIO(), **options)
+            with open(baseline) as f:
+                saved = json.load(f)
+            self.assertEqual(
+                set(saved['endpoints']), {'recipe-list', 'recipe-retrieve'}
+            )
+            self.assertFalse(Recipe.objects.exists())
+            self.assertEqual(
+                connection.settings_dict['NAME'], self.database_name
+            )
+
+            saved['endpoints']['recipe-list']['queries'] = 0
+            with open(baseline, 'w') as f:
+                json.dump(saved, f)
+            with self.assertRaisesMessage(CommandError, 'recipe-list'):
+                call_command('benchmark_endpoints', baseline=baseline,
+                             tolerance=1000, stdout=StringIO(), **options)
+
+
+class ImportRecipesCommandTests(TestCase):
+    """Test importing recipes from export files"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@email.com',
+            password='testPASS123',
+        )
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, content):
+        """Write an import file and return its path"""
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+
+        return path
+
+    def write_ndjson(self, count):
+        """Write an NDJSON file of count recipes"""
+        return self.write('recipes.ndjson', ''.join(json.dumps({
+            'title': f'Recipe {i}',
+            'time_minutes': 10,
+            'price': '5.00',
+            'link': '',
+            'tags': ['Vegan', 'Dessert'],
+            'ingredients': ['Oats'],
+        }) + '\n' for i in range(count)))
+
+    def assertImported(self, count):
+        """Assert count recipes were imported with their links"""
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), count)
+        recipe = recipes.order_by('id').first()
+        self.assertEqual(
+            sorted(recipe.tags.values_list('name', flat=True)),
+            ['Dessert', 'Vegan']
+        )
+        self.assertIn(self.tag, recipe.tags.all())
+        self.assertEqual(recipe.ingredients.get().name, 'Oats')
+        self.tag.refresh_from_db()
+        self.assertEqual(self.tag.recipe_count, count)
+
+    def test_import_ndjson_with_copy(self):
+        """Test importing NDJSON in batches with COPY"""
+        path = self.write_ndjson(5)
+        out = StringIO()
+
+        call_command(
+            'import_recipes', path, user=self.user.email, batch_size=2,
+            stdout=out
+        )
+
+        self.assertImported(5)
+        self.assertIn('Imported 5 recipes', out.getvalue())
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_import_ndjson_with_bulk_inserts(self):
+        """Test importing NDJSON with bulk inserts"""
+        path = self.write_ndjson(3)
+
+        call_command(
+            'import_recipes', path, user=self.user.email, no_copy=True,
+            stdout=StringIO()
+        )
+
+        self.assertImported(3)
+
+    def test_import_csv_with_user_column(self):
+        """Test importing CSV rows owned by the user in each row"""
+        path = self.write(
+            'recipes.csv',
+            'user,title,time_minutes,price,link,tags,ingredients\n'
+            f'{self.user.email},Porridge,5,1.50,,Vegan|Dessert,Oats\n'
+        )
+
+        call_command('import_recipes', path, stdout=StringIO())
+
+        self.assertImported(1)
+
+    def test_import_resumes_after_checkpoint(self):
+        """Test that a resumed import skips committed rows"""
+        path = self.write_ndjson(5)
+        ImportCheckpoint.objects.create(path=path, rows=3)
+
+        call_command(
+            'import_recipes', path, user=self.user.email, resume=True,
+            stdout=StringIO()
+        )
+
+        self.assertEqual(
+            list(Recipe.objects.values_list('title', flat=True)
+                 .order_by('id')),
+            ['Recipe 3', 'Recipe 4']
+        )
+
+    def test_import_failure_keeps_checkpoint_consistent(self):
+        """Test that resuming after a failed batch repeats no rows"""
+        path = self.write_ndjson(5)
+        import_batch = Importer.import_batch
+        calls = []
+
+        def failing_batch(command, rows):
+            calls.append(rows)
+            if len(calls) == 2:
+                raise RuntimeError('crash')
+            import_batch(command, rows)
+
+        with patch.object(Importer, 'import_batch', failing_batch):
+            with self.assertRaises(RuntimeError):
+                call_command(
+                    'import_recipes', path, user=self.user.email,
+                    batch_size=2, stdout=StringIO()
+                )
+        self.assertEqual(ImportCheckpoint.objects.get(path=path).rows, 2)
+
+        call_command(
+            'import_recipes', path, user=self.user.email, batch_size=2,
+            resume=True, stdout=StringIO()
+        )
+
+        self.assertEqual(
+            list(Recipe.objects.values_list('title', flat=True)
+                 .order_by('id')),
+            [f'Recipe {i}' for i in range(5)]
+        )
+
+    def test_import_empty_file(self):
+        """Test that an empty file imports nothing"""
+        path = self.write('recipes.ndjson', '')
+        out = StringIO()
+
+        call_command(
+            'import_recipes', path, user=self.user.email, stdout=out
+        )
+
+        self.assertIn('Imported 0 recipes', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_import_unknown_user(self):
+        """Test that rows of unknown users abort the import"""
+        path = self.write_ndjson(1)
+
+        with self.assertRaises(CommandError):
+            call_command(
+                'import_recipes', path, user='unknown@email.com',
+                stdout=StringIO()
+            )
+
+        self.assertFalse(Recipe.objects.exists())
+
+
+class SeedDataCommandTests(TestCase):
+    """Test generating synthetic data"""
+
+    def seed(self, **options):
+        """Seed a small dataset in this process"""
+        options = {
+            'users': 3, 'recipes': 200, 'tags': 10, 'ingredients': 20,
+            'workers': 1, 'chunk_size': 50, **options,
+        }
+        call_command('seed_data', stdout=StringIO(), **options)
+
+    def test_seed_data(self):
+        """Test generating users, tags, ingredients and linked recipes"""
+        self.seed()
+
+        self.assertEqual(get_user_model().objects.count(), 3)
+        self.assertEqual(Tag.objects.count(), 30)
+        self.assertEqual(Ingredient.objects.count(), 60)
+        self.assertEqual(Recipe.objects.count(), 200)
+        self.assertFalse(Recipe.objects.filter(search_vector=None).exists())
+        self.assertEqual(Tag.objects.recount_recipes(), 0)
+        self.assertEqual(Ingredient.objects.recount_recipes(), 0)
+        self.assertFalse(Recipe.tags.through.objects.exclude(
+            tag__user=F('recipe__user')
+        ).exists())
+
+    def test_seed_data_is_skewed(self):
+        """Test that popular tags and users get most of the recipes"""
+        self.seed(recipes=500, tag_skew=2, user_skew=2)
+
+        tags = Tag.objects.values('name').annotate(
+            count=Sum('recipe_count')
+        )
+        counts = {tag['name']: tag['count'] for tag in tags}
+        self.assertGreater(counts[TAG_WORDS[0]], counts[TAG_WORDS[9]])
+        recipes = list(get_user_model().objects.order_by('id').annotate(
+            count=Count('recipe')
+        ).values_list('count', flat=True))
+        self.assertGreater(recipes[0], recipes[-1])
+
+    def test_seed_data_is_deterministic(self):
+        """Test that a seed always generates the same recipes"""
+        def recipes():
+            return list(Recipe.objects.order_by('id', 'tags__name')
+                        .values_list('title', 'price', 'tags__name'))
+
+        self.seed(seed=1)
+        first = recipes()
+        Recipe.objects.all().delete()
+        get_user_model().objects.all().delete()
+        self.seed(seed=1)
+
+        self.assertEqual(recipes(), first)
+
+    def test_reserve_ids(self):
+        """Test that reserved ids are never handed out again"""
+        user = get_user_model().objects.create_user(email='user@email.com')
+        first = reserve_ids(Tag, 5)
+
+        tag = Tag.objects.create(user=user, name='Vegan')
+
+        self.assertEqual(reserve_ids(Tag, 0), 0)
+        self.assertGreater(tag.id, first + 4)
+
+    @patch('core.management.commands.seed_data.connection')
+    def test_reserve_ids_interleaved(self, connection):
+        """Test that a block interleaved with other draws is abandoned"""
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.side_effect = [(1, 6), (7, 11)]
+
+        self.assertEqual(reserve_ids(Tag, 5), 7)
+
+    def test_seed_data_twice(self):
+        """Test that seeding the same users twice is refused"""
+        self.seed()
+
+        with self.assertRaises(CommandError):
+            self.seed()
@@ -0,0 +1,143 @@
+import threading
+import uuid
+
+from django.db import connection
+from django.db.utils import OperationalError
+from django.test import TestCase
+
+from core.db.base import DatabaseWrapper
+
+
+class PooledDatabaseWrapperTests(TestCase):
+    """Test the connection limits, checks and counters of the backend"""
+
+    def make_wrapper(self, alias=None, max_age=60, **pool):
+        """Return a standalone connection to the test database"""
+        wrapper = DatabaseWrapper(
+            {**connection.settings_dict, 'CONN_MAX_AGE': max_age,
+             'POOL': pool},
+            alias=alias or f'pool-{uuid.uuid4()}',
+        )
+        self.addCleanup(wrapper.pool.close_idle)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_connection_checked_in_at_request_end(self):
+        """Test that a connection is reused by the next request"""
+        alias = f'pool-{uuid.uuid4()}'
+        first = self.make_wrapper(alias)
+        second = self.make_wrapper(alias)
+        first.ensure_connection()
+        raw = first.connection
+
+        first.close_if_unusable_or_obsolete()
+        self.assertIsNone(first.connection)
+        self.assertEqual(first.pool.stats()['idle'], 1)
+        second.ensure_connection()
+
+        self.assertIs(second.connection, raw)
+        stats = second.pool.stats()
+        self.assertEqual((stats['connects'], stats['reuses']), (1, 1))
+        self.assertEqual((stats['open'], stats['idle']), (1, 0))
+
+    def test_explicit_close_closes_connection(self):
+        """Test that closing a connection does not keep it in the pool"""
+        wrapper = self.make_wrapper()
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+
+        wrapper.close()
+
+        self.assertTrue(raw.closed)
+        stats = wrapper.pool.stats()
+        self.assertEqual((stats['open'], stats['idle']), (0, 0))
+
+    def test_health_check_replaces_broken_connection(self):
+        """Test that a dead idle connection is replaced before it is used"""
+        wrapper = self.make_wrapper(HEALTH_CHECKS=True)
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.close_if_unusable_or_obsolete()
+        raw.close()
+
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            self.assertEqual(cursor.fetchone(), (1,))
+
+        stats = wrapper.pool.stats()
+        self.assertEqual(stats['health_check_failures'], 1)
+        self.assertEqual(stats['connects'], 2)
+        self.assertEqual(stats['open'], 1)
+
+    def test_idle_connection_closed(self):
+        """Test that connections idle past the timeout are closed"""
+        wrapper = self.make_wrapper(IDLE_TIMEOUT=0)
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+
+        wrapper.close_if_unusable_or_obsolete()
+
+        self.assertTrue(raw.closed)
+        stats = wrapper.pool.stats()
+        self.assertEqual((stats['idle_closes'], stats['open']), (1, 0))
+
+    def test_old_connection_closed(self):
+        """Test that connections are not reused past CONN_MAX_AGE"""
+        wrapper = self.make_wrapper(max_age=0)
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+
+        wrapper.close_if_unusable_or_obsolete()
+
+        self.assertTrue(raw.closed)
+        self.assertEqual(wrapper.pool.stats()['open'], 0)
+
+    def test_max_size_limits_open_connections(self):
+        """Test that no more than MAX_SIZE connections open at once"""
+        alias = f'pool-{uuid.uuid4()}'
+        first = self.make_wrapper(alias, MAX_SIZE=1, TIMEOUT=0)
+        second = self.make_wrapper(alias, MAX_SIZE=1, TIMEOUT=0)
+        first.ensure_connection()
+
+        with self.assertRaises(OperationalError):
+            second.ensure_connection()
+        first.close_if_unusable_or_obsolete()
+        second.ensure_connection()
+
+        stats = second.pool.stats()
+        self.assertEqual(stats['connects'], 1)
+        self.assertEqual(stats['open'], 1)
+        self.assertEqual(stats['max_size'], 1)
+
+    def test_waiting_thread_gets_checked_in_connection(self):
+        """Test that a waiting thread is served once a request ends"""
+        alias = f'pool-{uuid.uuid4()}'
+        first = self.make_wrapper(alias, MAX_SIZE=1, TIMEOUT=5)
+        second = self.make_wrapper(alias, MAX_SIZE=1, TIMEOUT=5)
+        first.ensure_connection()
+        raw = first.connection
+        thread = threading.Thread(target=second.ensure_connection)
+        thread.start()
+
+        first.close_if_unusable_or_obsolete()
+        thread.join()
+
+        self.assertIs(second.connection, raw)
+        self.assertEqual(second.pool.stats()['reuses'], 1)
+        second.close()
+
+    def test_slot_of_exited_thread_reclaimed(self):
+        """Test that a thread exiting with an open connection frees its slot"""
+        alias = f'pool-{uuid.uuid4()}'
+        first = self.make_wrapper(alias, MAX_SIZE=1, TIMEOUT=0)
+        second = self.make_wrapper(alias, MAX_SIZE=1, TIMEOUT=0)
+        thread = threading.Thread(target=first.ensure_connection)
+        thread.start()
+        thread.join()
+
+        second.ensure_connection()
+
+        self.assertTrue(first.connection.closed)
+        stats = second.pool.stats()
+        self.assertEqual(stats['reclaims'], 1)
+        self.assertEqual(stats['open'], 1)
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from app import asgi
+from core.hashing import HashingPool, hashing_pool
+
+
+class HashingPoolTests(TestCase):
+    """Test the bounded password hashing pool"""
+
+    def test_run_returns_result_and_records_stats(self):
+        """Test that jobs run on the pool and are counted"""
+        pool = HashingPool(max_workers=1)
+
+        result = pool.run(sum, [1, 2, 3])
+
+        stats = pool.stats()
+        self.assertEqual(result, 6)
+        self.assertEqual(stats['jobs'], 1)
+        self.assertEqual(stats['pending'], 0)
+        self.assertGreaterEqual(stats['queue_time_max'], 0)
+
+    def test_queue_time_avg_ignores_waiting_jobs(self):
+        """Test that jobs still waiting for a worker do not lower the avg"""
+        pool = HashingPool(max_workers=1)
+        running, release = threading.Event(), threading.Event()
+
+        def block():
+            running.set()
+            release.wait()
+
+        threads = [
+            threading.Thread(target=pool.run, args=(block,)),
+            threading.Thread(target=pool.run, args=(time.sleep, 0)),
+        ]
+        threads[0].start()
+        running.wait()
+        threads[1].start()
+        while pool.stats()['jobs'] < 2:
+            time.sleep(0.001)
+        stats = pool.stats()
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual((stats['started'], stats['pending']), (1, 1))
+        self.assertEqual(stats['queue_time_avg'], stats['queue_time_total'])
+
+    def test_create_user_hashes_on_pool(self):
+        """Test that creating a user hashes the password on the pool"""
+        with patch.object(
+            hashing_pool, 'run', wraps=hashing_pool.run
+        ) as run:
+            user = get_user_model().objects.create_user(
+                email='user@email.com',
+                password='testPASS123',
+            )
+
+        run.assert_called_once_with(make_password, 'testPASS123')
+        self.assertTrue(user.check_password('testPASS123'))
+
+
+class AsgiHashingTests(SimpleTestCase):
+    """Test admitting password hashing requests under ASGI"""
+
+    def setUp(self):
+        asgi._hashing_slots = None
+        self.addCleanup(setattr, asgi, '_hashing_slots', None)
+
+    @override_settings(PASSWORD_HASHING_WORKERS=2)
+    def test_hashing_requests_bounded_by_pool_size(self):
+        """Test that no more hashing requests run than the pool has workers"""
+        running = []
+        most = 0
+
+        async def app(scope, receive, send):
+            nonlocal most
+            running.append(scope)
+            most = max(most, len(running))
+            await asyncio.sleep(0.01)
+            running.remove(scope)
+
+        async def requests():
+            await asyncio.gather(*(
+                asgi.application(
+                    {'type': 'http', 'path': reverse('users:auth-token')},
+                    None, None
+                ) for _ in range(5)
+            ))
+
+        with patch.object(asgi, 'django_application', app):
+            asyncio.run(requests())
+
+        self.assertEqual(most, 2)
+
+
+class PooledModelBackendTests(TestCase):
+    """Test authenticating with passwords verified on the pool"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@email.com',
+            password='testPASS123',
+        )
+
+    def test_authenticate_valid_credentials(self):
+        """Test that valid credentials authenticate the user"""
+        user = authenticate(username='user@email.com', password='testPASS123')
+
+        self.assertEqual(user, self.user)
+
+    def test_authenticate_invalid_credentials(self):
+        """Test that a wrong password or unknown user is rejected"""
+        self.assertIsNone(
+            authenticate(username='user@email.com', password='wrong')
+        )
+        self.assertIsNone(
+            authenticate(username='other@email.com', password='testPASS123')
+        )
+
+    def test_authenticate_inactive_user(self):
+        """Test that inactive users are rejected"""
+        self.user.is_active = False
+        self.user.save()
+
+        user = authenticate(username='user@email.com', password='testPASS123')
+
+        self.assertIsNone(user)
+
+    def test_outdated_hash_upgraded(self):
+        """Test that passwords stored with an old hasher are rehashed"""
+        with override_settings(PASSWORD_HASHERS=[
+            'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        ]):
+            self.user.set_password('testPASS123')
+            self.user.save()
+
+        authenticate(username='user@email.com', password='testPASS123')
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
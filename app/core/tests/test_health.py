@@ -0,0 +1,99 @@
+import importlib
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db.utils import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from app import wsgi
+from core import health
+
+
+HEALTHZ_URL = reverse('healthz')
+READYZ_URL = reverse('readyz')
+
+
+class HealthEndpointTests(TestCase):
+    """Test the liveness and readiness endpoints"""
+
+    def test_healthz_skips_database(self):
+        """Test that liveness is reported without any query"""
+        with self.assertNumQueries(0):
+            response = self.client.get(HEALTHZ_URL)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ok'})
+
+    def test_readyz_ready(self):
+        """Test that a reachable, migrated database is ready"""
+        response = self.client.get(READYZ_URL)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ok'})
+
+    def test_readyz_pool_stats_for_staff(self):
+        """Test that only staff users see the pool counters"""
+        self.client.force_login(get_user_model().objects.create_superuser(
+            email='admin@email.com',
+            password='testPASS123',
+        ))
+
+        response = self.client.get(READYZ_URL)
+
+        self.assertIn('connects', response.json()['pools']['default'])
+        self.assertIn('queue_time_avg', response.json()['hashing'])
+
+    @patch('core.views.check_database', side_effect=OperationalError())
+    def test_readyz_database_unavailable(self, check):
+        """Test that an unreachable database is not ready"""
+        response = self.client.get(READYZ_URL)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(
+            response.json()['status'], 'database unavailable'
+        )
+
+    @patch('core.health.MigrationExecutor')
+    def test_readyz_migrations_pending(self, executor):
+        """Test that pending migrations are reported until applied"""
+        health._migrated.discard('default')
+        executor.return_value.migration_plan.return_value = ['0001']
+
+        pending = self.client.get(READYZ_URL)
+        executor.return_value.migration_plan.return_value = []
+        self.client.get(READYZ_URL)
+        executor.reset_mock()
+        cached = self.client.get(READYZ_URL)
+
+        self.assertEqual(pending.status_code, 503)
+        self.assertEqual(pending.json()['status'], 'migrations pending')
+        self.assertEqual(cached.status_code, 200)
+        executor.assert_not_called()
+
+    @patch('core.health.connections')
+    def test_warmup_builds_serializer_fields(self, connections):
+        """Test that warming up instantiates the routed serializers"""
+        with patch('recipe.serializers.TagSerializer.get_fields') as fields:
+            fields.return_value = {}
+            health.warmup()
+
+        fields.assert_called_once_with()
+        connections.close_all.assert_called_once_with()
+
+    @patch('core.health.connections')
+    @patch('core.health.check_database', side_effect=OperationalError())
+    def test_warmup_survives_database_outage(self, check, connections):
+        """Test that warming up logs an unreachable database"""
+        with self.assertLogs('core.health', 'ERROR'):
+            health.warmup()
+
+        connections.close_all.assert_called_once_with()
+
+    @override_settings(WARMUP_ON_STARTUP=True)
+    @patch('core.health.warmup')
+    def test_warmup_when_application_loaded(self, warmup):
+        """Test that the application warms up before serving any request"""
+        importlib.reload(wsgi)
+
+        warmup.assert_called_once_with()
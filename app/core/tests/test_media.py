@@ -0,0 +1,195 @@
+import os
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+
+
+HASHED_NAME = 'uploads/recipe/ab/' + 'ab' * 32 + '.jpg'
+CONTENT = bytes(range(256)) * 4
+
+
+def media_url(path):
+    """Return the url serving the media file at path"""
+    return reverse('media', args=[path])
+
+
+class ServeMediaTests(TestCase):
+    """Test serving uploaded media files"""
+
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root.name
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        for name in (HASHED_NAME, 'uploads/recipe/renditions/a_thumb.jpg'):
+            path = os.path.join(self.media_root.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(CONTENT)
+
+    def test_serve_whole_file(self):
+        """Test that the whole file is served with validators"""
+        res = self.client.get(media_url(HASHED_NAME))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', res)
+        self.assertIn('Last-Modified', res)
+
+    def test_content_addressed_file_immutable(self):
+        """Test that content addressed names are cached for good"""
+        res = self.client.get(media_url(HASHED_NAME))
+        rendition = self.client.get(
+            media_url('uploads/recipe/renditions/a_thumb.jpg')
+        )
+
+        self.assertEqual(
+            res['Cache-Control'], 'public, max-age=31536000, immutable'
+        )
+        self.assertNotIn('immutable', rendition['Cache-Control'])
+
+    def test_missing_file_not_found(self):
+        """Test that missing files and directories return 404"""
+        self.assertEqual(
+            self.client.get(media_url('uploads/nope.jpg')).status_code, 404
+        )
+        self.assertEqual(
+            self.client.get(media_url('uploads/recipe')).status_code, 404
+        )
+
+    def test_path_outside_media_root_not_found(self):
+        """Test that paths escaping MEDIA_ROOT are rejected"""
+        res = self.client.get(media_url('../../etc/passwd'))
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_post_not_allowed(self):
+        """Test that media files are read only"""
+        res = self.client.post(media_url(HASHED_NAME))
+
+        self.assertEqual(res.status_code, 405)
+
+    def test_if_none_match_not_modified(self):
+        """Test that a matching ETag returns 304 without a body"""
+        etag = self.client.get(media_url(HASHED_NAME))['ETag']
+
+        res = self.client.get(media_url(HASHED_NAME), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b'')
+        self.assertEqual(res['ETag'], etag)
+
+    def test_if_modified_since_not_modified(self):
+        """Test that an up to date If-Modified-Since returns 304"""
+        last_modified = self.client.get(
+            media_url(HASHED_NAME)
+        )['Last-Modified']
+
+        res = self.client.get(
+            media_url(HASHED_NAME), HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+
+        self.assertEqual(res.status_code, 304)
+
+    def test_range_request(self):
+        """Test that a byte range returns 206 with just those bytes"""
+        res = self.client.get(media_url(HASHED_NAME), HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT[10:20])
+        self.assertEqual(
+            res['Content-Range'], f'bytes 10-19/{len(CONTENT)}'
+        )
+        self.assertEqual(res['Content-Length'], '10')
+
+    def test_open_and_suffix_ranges(self):
+        """Test that open ended and suffix ranges are clamped to the file"""
+        res_open = self.client.get(
+            media_url(HASHED_NAME), HTTP_RANGE='bytes=1000-5000'
+        )
+        res_suffix = self.client.get(
+            media_url(HASHED_NAME), HTTP_RANGE='bytes=-24'
+        )
+
+        self.assertEqual(b''.join(res_open.streaming_content), CONTENT[1000:])
+        self.assertEqual(
+            b''.join(res_suffix.streaming_content), CONTENT[-24:]
+        )
+
+    def test_unsatisfiable_range(self):
+        """Test that a range past the end of the file returns 416"""
+        res = self.client.get(
+            media_url(HASHED_NAME), HTTP_RANGE=f'bytes={len(CONTENT)}-'
+        )
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_stale_if_range_sends_whole_file(self):
+        """Test that a Range with a stale If-Range is ignored"""
+        res = self.client.get(
+            media_url(HASHED_NAME),
+            HTTP_RANGE='bytes=0-9',
+            HTTP_IF_RANGE='"stale"',
+        )
+        last_modified = self.client.get(
+            media_url(HASHED_NAME)
+        )['Last-Modified']
+        res_fresh = self.client.get(
+            media_url(HASHED_NAME),
+            HTTP_RANGE='bytes=0-9',
+            HTTP_IF_RANGE=last_modified,
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res_fresh.status_code, 206)
+
+    def test_multiple_ranges_send_whole_file(self):
+        """Test that multipart ranges fall back to the whole file"""
+        res = self.client.get(
+            media_url(HASHED_NAME), HTTP_RANGE='bytes=0-1,5-6'
+        )
+
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(MEDIA_SENDFILE='x-sendfile')
+    def test_x_sendfile(self):
+        """Test that X-Sendfile mode hands the path to the proxy"""
+        res = self.client.get(media_url(HASHED_NAME))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.content, b'')
+        self.assertEqual(
+            res['X-Sendfile'],
+            os.path.join(self.media_root.name, HASHED_NAME),
+        )
+        self.assertIn('immutable', res['Cache-Control'])
+
+    @override_settings(
+        MEDIA_SENDFILE='x-accel-redirect',
+        MEDIA_ACCEL_REDIRECT_PREFIX='/protected/',
+    )
+    def test_x_accel_redirect(self):
+        """Test that X-Accel-Redirect mode points nginx at the file"""
+        res = self.client.get(media_url(HASHED_NAME))
+
+        self.assertEqual(res['X-Accel-Redirect'], '/protected/' + HASHED_NAME)
+        self.assertNotIn('Content-Type', res)
+
+    def test_last_modified_matches_file(self):
+        """Test that Last-Modified reflects the file modification time"""
+        path = os.path.join(self.media_root.name, HASHED_NAME)
+        os.utime(path, (1600000000, 1600000000))
+
+        res = self.client.get(media_url(HASHED_NAME))
+
+        self.assertEqual(res['Last-Modified'], http_date(1600000000))
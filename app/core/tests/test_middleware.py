@@ -0,0 +1,114 @@
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.middleware import logger
+from core.models import Recipe
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
+TAGS_BATCH_URL = reverse('recipe:tag-batch')
+
+
+def timing_header(response):
+    """Return the Server-Timing metrics by name"""
+    return {
+        metric.split(';')[0]: metric
+        for metric in response['Server-Timing'].split(', ')
+    }
+
+
+@override_settings(REQUEST_TIMING=True, REQUEST_TIMING_SLOW_MS=10000)
+class RequestTimingMiddlewareTests(TestCase):
+    """Test the per request timing instrumentation"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@email.com',
+            password='testPASS123',
+        )
+        Recipe.objects.create(
+            user=self.user, title='Cake', time_minutes=5, price=1.00
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header(self):
+        """Test that queries and phase durations are reported"""
+        with self.assertNumQueries(3):
+            response = self.client.get(RECIPES_URL)
+
+        metrics = timing_header(response)
+        self.assertEqual(
+            list(metrics), ['db', 'view', 'serialize', 'total']
+        )
+        self.assertIn('desc="3 queries"', metrics['db'])
+        self.assertRegex(metrics['total'], r'^total;dur=\d+\.\d$')
+
+    def test_serializer_data_counts_as_serialization(self):
+        """Test that building serializer data is not reported as view time"""
+        def slow(serializer, instance):
+            time.sleep(0.2)
+            return {}
+
+        with patch('recipe.serializers.RecipeSerializer.to_representation',
+                   slow):
+            response = self.client.get(RECIPES_URL)
+
+        durations = {
+            name: float(metric.split('dur=')[1].split(';')[0])
+            for name, metric in timing_header(response).items()
+        }
+        self.assertGreaterEqual(durations['serialize'], 200)
+        self.assertLess(durations['view'], 200)
+
+    def test_directly_built_serializers_timed(self):
+        """Test that serializers built outside get_serializer are timed"""
+        def slow(serializer, instance):
+            time.sleep(0.1)
+            return {}
+
+        with patch('recipe.serializers.TagSerializer.to_representation',
+                   slow):
+            response = self.client.post(
+                TAGS_BATCH_URL, {'names': ['Vegan', 'Dessert']},
+                format='json'
+            )
+
+        serialize = timing_header(response)['serialize']
+        self.assertGreaterEqual(float(serialize.split('dur=')[1]), 200)
+
+    def test_streaming_response_not_timed(self):
+        """Test that streamed responses get no misleading timing"""
+        response = self.client.get(EXPORT_URL)
+
+        self.assertTrue(response.streaming)
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(REQUEST_TIMING=False)
+    def test_disabled(self):
+        """Test that nothing is added unless timing is enabled"""
+        response = APIClient().get(reverse('healthz'))
+
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(REQUEST_TIMING_SLOW_QUERIES=1)
+    def test_slow_request_logged(self):
+        """Test that requests over a threshold are logged with their SQL"""
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.client.get(RECIPES_URL)
+
+        self.assertIn(f'Slow request GET {RECIPES_URL} (200)', logs.output[0])
+        self.assertIn('FROM "core_recipe"', logs.output[0])
+
+    def test_fast_request_not_logged(self):
+        """Test that requests under the thresholds are not logged"""
+        with patch.object(logger, 'warning') as warning:
+            self.client.get(RECIPES_URL)
+
+        warning.assert_not_called()
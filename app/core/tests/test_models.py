@@ -1,3 +1,4 @@
+from django.db import connection
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from core import models
@@ -88,3 +89,106 @@ class TestModel(TestCase):
         expc_path = f'uploads/recipe/recipe_image_{uuid}.jpg'
 
         self.assertEqual(file_path, expc_path)
+
+
+class RecipeCountTests(TestCase):
+    """Test keeping tag and ingredient recipe counts up to date"""
+
+    def setUp(self):
+        self.user = sample_user()
+        self.tags = [
+            models.Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Dessert')
+        ]
+        self.recipes = [
+            models.Recipe.objects.create(
+                user=self.user, title=title, time_minutes=5, price=1.00
+            ) for title in ('Cake', 'Pie')
+        ]
+
+    def assertCounts(self, *counts):
+        """Assert the recipe counts of the tags"""
+        self.assertEqual(
+            [models.Tag.objects.get(pk=tag.pk).recipe_count
+             for tag in self.tags],
+            list(counts)
+        )
+
+    def test_counts_follow_recipe_links(self):
+        """Test counts on adding, removing and clearing recipe tags"""
+        cake, pie = self.recipes
+        vegan, dessert = self.tags
+
+        cake.tags.add(vegan, dessert)
+        pie.tags.add(dessert)
+        self.assertCounts(1, 2)
+
+        cake.tags.add(dessert)
+        cake.tags.remove(vegan)
+        pie.tags.remove(vegan)
+        self.assertCounts(0, 2)
+
+        pie.tags.set([vegan])
+        self.assertCounts(1, 1)
+
+        cake.tags.clear()
+        self.assertCounts(1, 0)
+
+    def test_counts_follow_reverse_links(self):
+        """Test counts when recipes are linked from the tag side"""
+        vegan = self.tags[0]
+
+        vegan.recipe_set.add(*self.recipes)
+        self.assertCounts(2, 0)
+
+        vegan.recipe_set.remove(self.recipes[0])
+        self.assertCounts(1, 0)
+
+        vegan.recipe_set.clear()
+        self.assertCounts(0, 0)
+
+    def test_counts_drop_deleted_recipes(self):
+        """Test that deleting a recipe decrements its tags"""
+        ingredient = models.Ingredient.objects.create(
+            user=self.user, name='Flour'
+        )
+        for recipe in self.recipes:
+            recipe.tags.add(*self.tags)
+            recipe.ingredients.add(ingredient)
+
+        self.recipes[0].delete()
+
+        self.assertCounts(1, 1)
+        ingredient.refresh_from_db()
+        self.assertEqual(ingredient.recipe_count, 1)
+
+
+class GetOrCreateManyTests(TestCase):
+    """Test resolving tag and ingredient names in bulk"""
+
+    def setUp(self):
+        self.user = sample_user()
+        self.vegan = models.Tag.objects.create(user=self.user, name='Vegan')
+
+    def ctid(self, tag):
+        """Return the physical location of the row of a tag"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT ctid::text FROM core_tag WHERE id = %s', [tag.pk]
+            )
+            return cursor.fetchone()[0]
+
+    def test_existing_names_not_rewritten(self):
+        """Test that existing names are returned without being updated"""
+        location = self.ctid(self.vegan)
+
+        results = models.Tag.objects.get_or_create_many(
+            self.user, ['Vegan', 'Dessert', 'Vegan']
+        )
+
+        self.assertEqual(
+            [(tag.name, created) for tag, created in results],
+            [('Dessert', True), ('Vegan', False)]
+        )
+        self.assertEqual(results[1][0].pk, self.vegan.pk)
+        self.assertEqual(self.ctid(self.vegan), location)
@@ -0,0 +1,129 @@
+from unittest.mock import MagicMock, patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.utils import OperationalError
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, override_settings
+)
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import routers
+from core.models import RecipeAttrVersion, Tag
+
+
+TAGS_LIST_URL = reverse('recipe:tag-list')
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    """Test choosing the database of each query"""
+
+    def setUp(self):
+        routers._down_until.clear()
+        self.router = routers.ReplicaRouter()
+
+    def test_reads_follow_request_context(self):
+        """Test that reads use the alias chosen for the request"""
+        self.assertIsNone(self.router.db_for_read(Tag))
+
+        token = routers.set_read_alias('replica_0')
+        self.assertEqual(self.router.db_for_read(Tag), 'replica_0')
+        self.assertEqual(self.router.db_for_write(Tag), 'default')
+        routers.reset_read_alias(token)
+
+        self.assertIsNone(self.router.db_for_read(Tag))
+
+    def test_migrations_only_on_primary(self):
+        """Test that replicas are never migrated"""
+        self.assertTrue(self.router.allow_migrate('default', 'core'))
+        self.assertFalse(self.router.allow_migrate('replica_0', 'core'))
+
+    @override_settings(DATABASE_REPLICAS=['down', 'up'])
+    def test_unreachable_replica_skipped(self):
+        """Test that a failing replica is skipped until retried"""
+        connections = {'down': MagicMock(), 'up': MagicMock()}
+        connections['down'].ensure_connection.side_effect = OperationalError
+
+        with patch('core.routers.connections', connections):
+            chosen = [routers.choose_replica() for _ in range(5)]
+
+        self.assertEqual(chosen, ['up'] * 5)
+        self.assertLessEqual(connections['down'].ensure_connection.call_count,
+                             1)
+
+    @override_settings(DATABASE_REPLICAS=['down'])
+    def test_falls_back_to_primary(self):
+        """Test that reads go to the primary when no replica answers"""
+        connection = MagicMock()
+        connection.ensure_connection.side_effect = OperationalError
+
+        with patch('core.routers.connections', {'down': connection}):
+            self.assertIsNone(routers.choose_replica())
+
+
+@override_settings(DATABASE_REPLICAS=['default'])
+class ReplicaReadApiTests(TestCase):
+    """Test routing API requests to replicas"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@email.com',
+            password='testPASS123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_safe_requests_read_from_replica(self):
+        """Test that list requests read from a replica"""
+        with patch('core.routers.set_read_alias',
+                   wraps=routers.set_read_alias) as set_read_alias:
+            response = self.client.get(TAGS_LIST_URL)
+
+        self.assertEqual(response.status_code, 200)
+        set_read_alias.assert_called_once_with('default')
+        self.assertIsNone(routers.ReplicaRouter().db_for_read(Tag))
+
+    def test_reads_pinned_to_primary_after_write(self):
+        """Test that users read from the primary right after writing"""
+        self.client.post(TAGS_LIST_URL, {'name': 'Vegan'})
+
+        with patch('core.routers.set_read_alias') as set_read_alias:
+            response = self.client.get(TAGS_LIST_URL)
+
+        set_read_alias.assert_not_called()
+        self.assertEqual(response.data[0]['name'], 'Vegan')
+
+    def test_pin_checked_without_queries(self):
+        """Test that the pin cookie is checked without touching a database"""
+        response = self.client.post(TAGS_LIST_URL, {'name': 'Vegan'})
+        request = RequestFactory().get(TAGS_LIST_URL)
+        request.COOKIES = {
+            key: morsel.value for key, morsel in response.cookies.items()
+        }
+
+        with self.assertNumQueries(0):
+            self.assertTrue(routers.is_pinned(request, self.user.pk))
+            self.assertFalse(routers.is_pinned(request, self.user.pk + 1))
+        self.assertEqual(
+            response.cookies[routers.PIN_COOKIE]['max-age'],
+            settings.REPLICA_PIN_SECONDS
+        )
+
+    def test_failed_write_does_not_pin(self):
+        """Test that rejected writes keep the user on replicas"""
+        response = self.client.post(TAGS_LIST_URL, {'name': ''})
+
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_replica_without_version_sends_no_etag(self):
+        """Test that a list read from a lagging replica has no ETag"""
+        RecipeAttrVersion.objects.filter(user=self.user).delete()
+
+        # Writes going elsewhere make the default alias act as a replica
+        with patch('core.models.router.db_for_write', return_value='primary'):
+            response = self.client.get(TAGS_LIST_URL)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        self.assertFalse(RecipeAttrVersion.objects.exists())
@@ -0,0 +1,135 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Recipe, StoredImage
+from core.storage import recipe_image_storage
+
+
+def sample_recipe(user, title='Omelette'):
+    """Create and return a sample recipe"""
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=5, price=1.00
+    )
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Test storing recipe images by content hash"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@email.com',
+            password='testPASS123',
+        )
+        self.names = set()
+
+    def tearDown(self):
+        for name in self.names:
+            recipe_image_storage.delete(name)
+
+    def save_image(self, recipe, content):
+        """Save content as the image of recipe"""
+        recipe.image.save('photo.JPG', ContentFile(content))
+        self.names.add(recipe.image.name)
+
+        return recipe.image.name
+
+    def test_identical_content_stored_once(self):
+        """Test that identical uploads share one file"""
+        recipe1 = sample_recipe(self.user)
+        recipe2 = sample_recipe(self.user)
+
+        with patch.object(
+            FileSystemStorage, '_save', autospec=True,
+            side_effect=FileSystemStorage._save
+        ) as save:
+            name1 = self.save_image(recipe1, b'image bytes')
+            name2 = self.save_image(recipe2, b'image bytes')
+
+        self.assertEqual(name1, name2)
+        self.assertTrue(name1.startswith('uploads/recipe/'))
+        self.assertTrue(name1.endswith('.jpg'))
+        self.assertEqual(save.call_count, 1)
+        self.assertEqual(StoredImage.objects.get(name=name1).refcount, 2)
+
+    def test_replaced_and_deleted_images_released(self):
+        """Test that references move on replacement and deletion"""
+        recipe = sample_recipe(self.user)
+        old = self.save_image(recipe, b'old image')
+        new = self.save_image(recipe, b'new image')
+
+        self.assertEqual(StoredImage.objects.get(name=old).refcount, 0)
+        self.assertEqual(StoredImage.objects.get(name=new).refcount, 1)
+
+        recipe.delete()
+
+        self.assertEqual(StoredImage.objects.get(name=new).refcount, 0)
+
+    def test_collect_unreferenced_images(self):
+        """Test that only unreferenced images past the grace are removed"""
+        kept = self.save_image(sample_recipe(self.user), b'kept')
+        recipe = sample_recipe(self.user)
+        orphan = self.save_image(recipe, b'orphan')
+        recipe.delete()
+        StoredImage.objects.filter(name=orphan).update(
+            updated=timezone.now() - timedelta(hours=2)
+        )
+
+        call_command('collect_images', stdout=StringIO())
+
+        self.assertFalse(recipe_image_storage.exists(orphan))
+        self.assertFalse(StoredImage.objects.filter(name=orphan).exists())
+        self.assertTrue(recipe_image_storage.exists(kept))
+
+    def test_collect_images_within_grace_kept(self):
+        """Test that recently released images are kept"""
+        recipe = sample_recipe(self.user)
+        name = self.save_image(recipe, b'recent')
+        recipe.delete()
+
+        call_command('collect_images', stdout=StringIO())
+
+        self.assertTrue(recipe_image_storage.exists(name))
+
+    def test_collect_images_keeps_reused_file(self):
+        """Test that saving an unreferenced image again protects it"""
+        recipe = sample_recipe(self.user)
+        name = self.save_image(recipe, b'reused')
+        recipe.delete()
+        StoredImage.objects.filter(name=name).update(
+            updated=timezone.now() - timedelta(hours=2)
+        )
+
+        saved = recipe_image_storage.save(
+            'uploads/recipe/photo.jpg', ContentFile(b'reused')
+        )
+        call_command('collect_images', stdout=StringIO())
+
+        self.assertEqual(saved, name)
+        self.assertTrue(recipe_image_storage.exists(name))
+        self.assertTrue(StoredImage.objects.filter(name=name).exists())
+
+    def test_available_name_unchanged(self):
+        """Test that an existing content address is never renamed"""
+        name = self.save_image(sample_recipe(self.user), b'existing')
+
+        self.assertEqual(recipe_image_storage.get_available_name(name), name)
+
+    def test_collect_images_recount(self):
+        """Test that drifted reference counts are repaired"""
+        name = self.save_image(sample_recipe(self.user), b'drifted')
+        StoredImage.objects.filter(name=name).update(
+            refcount=0, updated=timezone.now() - timedelta(hours=2)
+        )
+
+        call_command('collect_images', recount=True, stdout=StringIO())
+
+        self.assertTrue(recipe_image_storage.exists(name))
+        self.assertEqual(StoredImage.objects.get(name=name).refcount, 1)
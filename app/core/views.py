@@ -0,0 +1,174 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import DatabaseError
+from django.http import (
+    FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+)
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+from .db.base import stats as pool_stats
+from .hashing import hashing_pool
+from .health import check_database, migrations_applied
+
+
+BLOCK_SIZE = 64 * 1024
+
+# Content addressed originals never change, see core.storage
+IMMUTABLE_NAME = re.compile(r'^[0-9a-f]{64}\.\w+$')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _cache_control(path):
+    """Return the Cache-Control header for a media file"""
+    if IMMUTABLE_NAME.match(os.path.basename(path)):
+        return 'public, max-age=31536000, immutable'
+
+    return f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+
+
+def _byte_range(request, size, etag, last_modified):
+    """Return the (start, end) of a satisfiable single Range, if any
+
+    Raises ValueError for ranges outside the file. Multiple ranges and
+    ranges not matching If-Range are ignored, so the whole file is sent.
+    """
+    match = RANGE.match(request.META.get('HTTP_RANGE', '').strip())
+    if not match or match.groups() == ('', ''):
+        return None
+
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag and (
+        parse_http_date_safe(if_range) != last_modified
+    ):
+        return None
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end or start >= size:
+        raise ValueError('Range not satisfiable')
+
+    return start, end
+
+
+def _read_range(path, start, end):
+    """Yield the bytes of path between start and end inclusive"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining:
+            block = f.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                return
+            remaining -= len(block)
+            yield block
+
+
+def _sendfile_response(path, relative_path):
+    """Return a response handing the file over to the front proxy"""
+    response = HttpResponse()
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_ACCEL_REDIRECT_PREFIX + relative_path
+        )
+    else:
+        response['X-Sendfile'] = path
+    # Let the proxy pick the content type
+    del response['Content-Type']
+
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve an uploaded media file with caching and range support"""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('File not found')
+    if not os.path.isfile(full_path):
+        raise Http404('File not found')
+
+    etag = quote_etag(f'{stat.st_size:x}-{stat.st_mtime_ns:x}')
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+
+    if response is None and settings.MEDIA_SENDFILE:
+        response = _sendfile_response(full_path, path)
+    elif response is None:
+        try:
+            byte_range = _byte_range(
+                request, stat.st_size, etag, last_modified
+            )
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+        content_type = (
+            mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        )
+        if byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _read_range(full_path, start, end),
+                status=206,
+                content_type=content_type,
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = end - start + 1
+        else:
+            # FileResponse lets the WSGI server use sendfile() when it can
+            response = FileResponse(
+                open(full_path, 'rb'), content_type=content_type
+            )
+            response['Content-Length'] = stat.st_size
+        response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = _cache_control(path)
+
+    return response
+
+
+@require_safe
+def healthz(request):
+    """Report that the process is alive, without touching the database"""
+    return JsonResponse({'status': 'ok'})
+
+
+@require_safe
+def readyz(request):
+    """Report whether the database is reachable and fully migrated
+
+    Staff users also get the connection and password hashing pool counters
+    of the answering process.
+    """
+    try:
+        check_database()
+        ready = migrations_applied()
+        detail = 'ok' if ready else 'migrations pending'
+    except DatabaseError:
+        ready, detail = False, 'database unavailable'
+
+    data = {'status': detail}
+    if request.user.is_staff:
+        data['pools'] = pool_stats()
+        data['hashing'] = hashing_pool.stats()
+
+    return JsonResponse(data, status=200 if ready else 503)
@@ -0,0 +1,104 @@
+import bisect
+import heapq
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+WORD = re.compile(r'\w+')
+
+
+def trigrams(text):
+    """Return the trigrams of text, padding words the way pg_trgm does"""
+    grams = set()
+    for word in WORD.findall(text.casefold()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NameIndex:
+    """Case insensitive sorted index of one user's tag or ingredient names"""
+
+    def __init__(self, rows):
+        entries = sorted((name.casefold(), name, pk) for pk, name in rows)
+        self.keys = [key for key, _, _ in entries]
+        self.entries = [(pk, name) for _, name, pk in entries]
+        self._trigrams = None
+
+    def prefix(self, prefix, limit):
+        """Return up to limit (id, name) pairs starting with prefix"""
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(self.keys, prefix)
+        end = start
+        while (end < len(self.keys) and end - start < limit
+               and self.keys[end].startswith(prefix)):
+            end += 1
+
+        return self.entries[start:end]
+
+    def similar(self, text, limit, threshold, exclude=()):
+        """Return up to limit (id, name) pairs most similar to text
+
+        Similarity is the share of trigrams the names have in common, as
+        computed by pg_trgm, and must be at least threshold.
+        """
+        grams = trigrams(text)
+        if not grams:
+            return []
+        if self._trigrams is None:
+            self._trigrams = [trigrams(name) for _, name in self.entries]
+
+        scored = []
+        for entry, name_grams in zip(self.entries, self._trigrams):
+            union = len(grams | name_grams)
+            score = len(grams & name_grams) / union if union else 0
+            if score >= threshold and entry[0] not in exclude:
+                scored.append((-score, entry[1], entry))
+
+        return [entry for _, _, entry in heapq.nsmallest(limit, scored)]
+
+
+class AutocompleteCache:
+    """Thread safe LRU cache of name indexes tagged with a list version
+
+    An index is rebuilt when the version it was built for is no longer the
+    current one, so every process drops it once the list changes. Indexes
+    of an unknown version, read from a lagging replica, are not kept.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version, load):
+        """Return the index for key at version, building it from load()"""
+        if version is None:
+            return NameIndex(load())
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        index = NameIndex(load())
+        with self._lock:
+            self._entries[key] = (version, index)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return index
+
+    def clear(self):
+        """Drop all indexes"""
+        with self._lock:
+            self._entries.clear()
+
+
+autocomplete_cache = AutocompleteCache(
+    max_size=settings.RECIPE_AUTOCOMPLETE_CACHE_SIZE
+)
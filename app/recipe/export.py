@@ -0,0 +1,80 @@
+import csv
+import json
+from collections import defaultdict
+from itertools import islice
+
+from core.models import Recipe
+
+
+EXPORT_FIELDS = ('id', 'title', 'time_minutes', 'price', 'link',
+                 'tags', 'ingredients')
+
+# Separates tag and ingredient names inside a single CSV column
+CSV_LIST_SEPARATOR = '|'
+
+
+def _names_by_recipe(field, recipe_ids):
+    """Return the related names of each recipe in recipe_ids"""
+    related = Recipe._meta.get_field(field).related_model._meta.model_name
+    names = defaultdict(list)
+    links = getattr(Recipe, field).through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', f'{related}__name').order_by(f'{related}_id')
+    for recipe_id, name in links:
+        names[recipe_id].append(name)
+
+    return names
+
+
+def export_rows(queryset, chunk_size):
+    """Yield recipes as dicts, loading tags and ingredients per chunk
+
+    Recipes are read through a server-side cursor, so memory use depends
+    on chunk_size rather than on the number of recipes.
+    """
+    recipes = queryset.values(
+        'id', 'title', 'time_minutes', 'price', 'link'
+    ).iterator(chunk_size=chunk_size)
+
+    while True:
+        chunk = list(islice(recipes, chunk_size))
+        if not chunk:
+            return
+
+        ids = [recipe['id'] for recipe in chunk]
+        tags = _names_by_recipe('tags', ids)
+        ingredients = _names_by_recipe('ingredients', ids)
+        for recipe in chunk:
+            recipe['price'] = str(recipe['price'])
+            recipe['tags'] = tags[recipe['id']]
+            recipe['ingredients'] = ingredients[recipe['id']]
+            yield recipe
+
+
+def to_ndjson(rows):
+    """Encode rows as newline delimited JSON"""
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+
+class _Echo:
+    """File-like object returning what is written, for streaming CSV"""
+
+    def write(self, value):
+        return value
+
+
+def to_csv(rows):
+    """Encode rows as CSV with a header line"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        row['tags'] = CSV_LIST_SEPARATOR.join(row['tags'])
+        row['ingredients'] = CSV_LIST_SEPARATOR.join(row['ingredients'])
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+
+
+EXPORT_FORMATS = {
+    'ndjson': (to_ndjson, 'application/x-ndjson'),
+    'csv': (to_csv, 'text/csv'),
+}
@@ -0,0 +1,29 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class BaseCursorPagination(CursorPagination):
+    """Keyset pagination enabled when the client asks for a page size.
+
+    Without a ``page_size`` query parameter the list is returned as a plain
+    array, so existing clients keep working. The opaque ``next`` and
+    ``previous`` links carry the page size forward.
+    """
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = settings.RECIPE_PAGINATION_MAX_PAGE_SIZE
+
+
+class RecipeAttrCursorPagination(BaseCursorPagination):
+    """Cursor pagination for tags and ingredients"""
+    ordering = '-name'
+
+
+class RecipeCursorPagination(BaseCursorPagination):
+    """Cursor pagination for recipes"""
+    ordering = 'id'
+
+
+class RecipeSearchCursorPagination(BaseCursorPagination):
+    """Cursor pagination for ranked recipe search results"""
+    ordering = ('-rank', '-id')
@@ -0,0 +1,106 @@
+import io
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from core.models import Recipe
+
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.RECIPE_IMAGE_WORKERS,
+    thread_name_prefix='recipe-renditions',
+)
+
+
+def rendition_path(image_name, rendition):
+    """Return the storage path of a rendition of image_name"""
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return os.path.join(
+        'uploads', 'recipe', 'renditions', f'{stem}_{rendition}.jpg'
+    )
+
+
+def open_original(image_name):
+    """Return the upright RGB pixels of an uploaded image"""
+    storage = Recipe._meta.get_field('image').storage
+    with storage.open(image_name) as f:
+        return ImageOps.exif_transpose(Image.open(f)).convert('RGB')
+
+
+def render(original, size):
+    """Return the JPEG bytes of original scaled down to fit size"""
+    image = original.copy()
+    image.thumbnail(size, Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(
+        buffer, 'JPEG', optimize=True, progressive=True,
+        quality=settings.RECIPE_IMAGE_RENDITION_QUALITY,
+    )
+
+    return buffer.getvalue()
+
+
+def save_atomically(path, content):
+    """Write content under a temporary name, then move it to path
+
+    Readers see no file or the whole file, never a partial one.
+    """
+    temp = default_storage.save(
+        f'{path}.{uuid.uuid4().hex}.tmp', ContentFile(content)
+    )
+    os.replace(default_storage.path(temp), default_storage.path(path))
+
+
+def generate_renditions(recipe_id, image_name):
+    """Write every configured rendition of an image and record them
+
+    Renditions are named after the content of the image and shared by the
+    recipes using it, so existing ones are reused, never rewritten under
+    their readers. The recipe is only updated if it still has the same
+    image, so a slow job cannot overwrite the renditions of a newer upload.
+    """
+    try:
+        original = None
+        renditions = {}
+        for name, size in settings.RECIPE_IMAGE_RENDITIONS.items():
+            path = rendition_path(image_name, name)
+            if not default_storage.exists(path):
+                if original is None:
+                    original = open_original(image_name)
+                save_atomically(path, render(original, size))
+            renditions[name] = path
+        status = Recipe.ImageStatus.READY
+    except Exception:
+        logger.exception('Failed to render recipe image %s', image_name)
+        renditions = {}
+        status = Recipe.ImageStatus.FAILED
+
+    Recipe.objects.filter(id=recipe_id, image=image_name).update(
+        image_status=status,
+        image_renditions=renditions,
+    )
+
+
+def _run(recipe_id, image_name):
+    """Worker entry point, releasing the thread's database connection"""
+    try:
+        generate_renditions(recipe_id, image_name)
+    finally:
+        connection.close()
+
+
+def schedule_renditions(recipe):
+    """Generate the renditions of a recipe image once it is committed"""
+    image_name = recipe.image.name
+    transaction.on_commit(
+        lambda: executor.submit(_run, recipe.id, image_name)
+    )
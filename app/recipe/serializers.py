@@ -1,6 +1,20 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
-from core.models import Tag, Ingredient, Recipe
+from core.models import (
+    Tag, Ingredient, Recipe, RecipeImageUpload
+)
+
+
+def rendition_urls(recipe):
+    """Return the URL of each generated image rendition"""
+    return {
+        name: default_storage.url(path)
+        for name, path in recipe.image_renditions.items()
+    }
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -21,6 +35,29 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
+class TagCountSerializer(TagSerializer):
+    """Serializer class for Tag object with its recipe count"""
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ('recipe_count',)
+
+
+class IngredientCountSerializer(IngredientSerializer):
+    """Serializer class for Ingredient object with its recipe count"""
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ('recipe_count',)
+
+
+class RecipeAttrBatchSerializer(serializers.Serializer):
+    """Serializer class for getting or creating tags/ingredients by name"""
+    names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        allow_empty=False,
+        max_length=settings.RECIPE_BULK_MAX_ITEMS,
+    )
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """Serializer class for Recipe objects"""
     ingredients = serializers.PrimaryKeyRelatedField(
@@ -32,11 +69,16 @@ class RecipeSerializer(serializers.ModelSerializer):
         queryset=Tag.objects.all()
     )
 
+    image_renditions = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
         fields = ('id', 'title', 'ingredients', 'tags', 'time_minutes',
-                  'price', 'link')
-        read_only_fields = ('id',)
+                  'price', 'link', 'image_status', 'image_renditions')
+        read_only_fields = ('id', 'image_status')
+
+    def get_image_renditions(self, recipe):
+        return rendition_urls(recipe)
 
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -47,8 +89,108 @@ class RecipeDetailSerializer(RecipeSerializer):
 
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer class for uploading an image to recipe"""
+    image_renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
+        fields = ('id', 'image', 'image_status', 'image_renditions')
+        read_only_fields = ('id', 'image_status')
+
+    def get_image_renditions(self, recipe):
+        return rendition_urls(recipe)
+
+
+class RecipeBulkListSerializer(serializers.ListSerializer):
+    """Validate and create many recipes with a fixed number of queries"""
+
+    def _check_owned(self, model, field, attrs):
+        """Raise unless every related id belongs to the user"""
+        ids = {pk for item in attrs for pk in item.get(field, [])}
+        owned = set(model.objects.filter(
+            user=self.context['request'].user, id__in=ids
+        ).values_list('id', flat=True))
+        missing = sorted(ids - owned)
+        if missing:
+            raise serializers.ValidationError(
+                {field: _('Invalid ids: %s') % missing}
+            )
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError(_('No recipes provided'))
+        if len(attrs) > settings.RECIPE_BULK_MAX_ITEMS:
+            raise serializers.ValidationError(
+                _('At most %d recipes per request')
+                % settings.RECIPE_BULK_MAX_ITEMS
+            )
+        self._check_owned(Tag, 'tags', attrs)
+        self._check_owned(Ingredient, 'ingredients', attrs)
+
+        return attrs
+
+    def create(self, validated_data):
+        tags = [set(item.pop('tags', [])) for item in validated_data]
+        ingredients = [
+            set(item.pop('ingredients', [])) for item in validated_data
+        ]
+
+        with transaction.atomic():
+            recipes = Recipe.objects.bulk_create(
+                [Recipe(**item) for item in validated_data],
+                batch_size=settings.RECIPE_BULK_BATCH_SIZE,
+            )
+            Recipe.objects.link_bulk(recipes, [
+                Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+                for recipe, tag_ids in zip(recipes, tags)
+                for tag_id in tag_ids
+            ], [
+                Recipe.ingredients.through(
+                    recipe_id=recipe.id, ingredient_id=ingredient_id
+                )
+                for recipe, ingredient_ids in zip(recipes, ingredients)
+                for ingredient_id in ingredient_ids
+            ], batch_size=settings.RECIPE_BULK_BATCH_SIZE)
+
+        return recipes
+
+
+class RecipeBulkSerializer(serializers.ModelSerializer):
+    """Serializer class for creating recipes in bulk"""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(), required=False
+    )
+    tags = serializers.ListField(
+        child=serializers.IntegerField(), required=False
+    )
+
+    class Meta:
+        model = Recipe
+        fields = ('id', 'title', 'ingredients', 'tags', 'time_minutes',
+                  'price', 'link')
         read_only_fields = ('id',)
+        list_serializer_class = RecipeBulkListSerializer
+
+
+class RecipeImageUploadSerializer(serializers.ModelSerializer):
+    """Serializer class for resumable recipe image uploads"""
+
+    class Meta:
+        model = RecipeImageUpload
+        fields = ('id', 'recipe', 'filename', 'size', 'sha256', 'offset')
+        read_only_fields = ('id', 'recipe', 'offset')
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.RECIPE_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                _('Size must be between 1 and %d bytes')
+                % settings.RECIPE_UPLOAD_MAX_SIZE
+            )
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if len(value) != 64 or set(value) - set('0123456789abcdef'):
+            raise serializers.ValidationError(
+                _('Must be a hex encoded SHA-256 digest')
+            )
+        return value
@@ -0,0 +1,67 @@
+from django.test import SimpleTestCase
+
+from recipe.autocomplete import AutocompleteCache, NameIndex, trigrams
+
+
+class NameIndexTests(SimpleTestCase):
+    """Test the in-memory name index behind autocomplete"""
+
+    def setUp(self):
+        self.index = NameIndex([
+            (1, 'Tomato'), (2, 'tofu'), (3, 'Toast'), (4, 'Cinnamon'),
+            (5, 'Cinnamon sugar'),
+        ])
+
+    def test_trigrams_match_pg_trgm(self):
+        """Test that words are padded like pg_trgm pads them"""
+        self.assertEqual(
+            trigrams('Cat'), {'  c', ' ca', 'cat', 'at '}
+        )
+
+    def test_prefix_case_insensitive(self):
+        """Test that prefix matches ignore case and keep name order"""
+        self.assertEqual(
+            self.index.prefix('TO', 10),
+            [(3, 'Toast'), (2, 'tofu'), (1, 'Tomato')]
+        )
+        self.assertEqual(self.index.prefix('to', 1), [(3, 'Toast')])
+        self.assertEqual(self.index.prefix('x', 10), [])
+
+    def test_similar_ranked_by_similarity(self):
+        """Test that similar names are ranked and thresholded"""
+        self.assertEqual(
+            self.index.similar('cinamon', 5, 0.3),
+            [(4, 'Cinnamon'), (5, 'Cinnamon sugar')]
+        )
+        self.assertEqual(
+            self.index.similar('cinamon', 5, 0.3, exclude={4}),
+            [(5, 'Cinnamon sugar')]
+        )
+        self.assertEqual(self.index.similar('', 5, 0.3), [])
+
+
+class AutocompleteCacheTests(SimpleTestCase):
+    """Test caching name indexes by list version"""
+
+    def test_reload_on_new_version(self):
+        """Test that an index is only rebuilt when the version changes"""
+        cache = AutocompleteCache(max_size=10)
+        loads = []
+
+        def load():
+            loads.append(1)
+            return [(1, 'Vegan')]
+
+        cache.get('key', 1, load)
+        cache.get('key', 1, load)
+        cache.get('key', 2, load)
+
+        self.assertEqual(len(loads), 2)
+
+    def test_least_recently_used_evicted(self):
+        """Test that the cache stays within its size"""
+        cache = AutocompleteCache(max_size=1)
+        cache.get('a', 1, list)
+        cache.get('b', 1, list)
+
+        self.assertEqual(list(cache._entries), ['b'])
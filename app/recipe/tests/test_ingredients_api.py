@@ -10,6 +10,8 @@ from core.models import Ingredient, Recipe
 from recipe.serializers import IngredientSerializer
 
 INGREDIENTS_LIST_URL = reverse('recipe:ingredient-list')
+INGREDIENTS_BATCH_URL = reverse('recipe:ingredient-batch')
+INGREDIENTS_AUTOCOMPLETE_URL = reverse('recipe:ingredient-autocomplete')
 
 
 class PublicIngredientsAPITests(TestCase):
@@ -143,3 +145,64 @@ class PrivateIngredientsAPITests(TestCase):
         response = self.client.get(INGREDIENTS_LIST_URL, {'assigned_only': 1})
 
         self.assertEqual(len(response.data), 1)
+
+    def test_retrieve_ingredients_not_modified(self):
+        """Test that an unchanged ingredient list answers 304"""
+        Ingredient.objects.create(user=self.user, name='Eggs')
+        response = self.client.get(INGREDIENTS_LIST_URL)
+
+        response = self.client.get(
+            INGREDIENTS_LIST_URL, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_retrieve_ingredients_modified_after_recipe_delete(self):
+        """Test that deleting a recipe changes the ingredient list ETag"""
+        ingredient = Ingredient.objects.create(user=self.user, name='Eggs')
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Omelette',
+            time_minutes=5,
+            price=1.00,
+        )
+        recipe.ingredients.add(ingredient)
+        params = {'assigned_only': 1}
+        etag = self.client.get(INGREDIENTS_LIST_URL, params)['ETag']
+        recipe.delete()
+
+        response = self.client.get(
+            INGREDIENTS_LIST_URL, params, HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 0)
+
+    def test_batch_get_or_create_ingredients(self):
+        """Test getting ids for ingredient names, creating missing ones"""
+        existing = Ingredient.objects.create(user=self.user, name='Eggs')
+
+        response = self.client.post(
+            INGREDIENTS_BATCH_URL, {'names': ['Eggs', 'Oats']}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ingredients = {item['name']: item for item in response.data}
+        self.assertEqual(ingredients['Eggs']['id'], existing.id)
+        self.assertTrue(ingredients['Oats']['created'])
+        self.assertEqual(
+            Ingredient.objects.filter(user=self.user).count(), 2
+        )
+
+    def test_autocomplete_ingredients(self):
+        """Test that only the user's ingredients are suggested"""
+        Ingredient.objects.create(user=self.user, name='Salt')
+        Ingredient.objects.create(user=self.user, name='Salmon')
+        Ingredient.objects.create(user=self.user, name='Sugar')
+
+        response = self.client.get(INGREDIENTS_AUTOCOMPLETE_URL, {'q': 'sal'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['name'] for item in response.data], ['Salmon', 'Salt']
+        )
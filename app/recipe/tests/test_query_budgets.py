@@ -0,0 +1,99 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+RECIPE_LIST_URL = reverse('recipe:recipe-list')
+
+# Maximum number of SQL queries each endpoint may issue, independent of how
+# many objects the authenticated user owns
+QUERY_BUDGETS = {
+    'recipe-list': 3,
+    'recipe-detail': 3,
+}
+
+
+def recipe_detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class RecipeQueryBudgetTests(TestCase):
+    """Test that the recipe read endpoints stay within their query budget"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@email.com',
+            password='testPASS678',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def create_recipes(self, count):
+        """Create recipes that each have two tags and two ingredients"""
+        recipes = []
+        for i in range(count):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i}',
+                time_minutes=10,
+                price=5.00,
+            )
+            for j in range(2):
+                recipe.tags.add(
+                    Tag.objects.create(
+                        user=self.user, name=f'Tag {recipe.id}-{j}'
+                    )
+                )
+                recipe.ingredients.add(
+                    Ingredient.objects.create(
+                        user=self.user, name=f'Ingredient {recipe.id}-{j}'
+                    )
+                )
+            recipes.append(recipe)
+
+        return recipes
+
+    def assertWithinBudget(self, endpoint, url, params=None):
+        """Request url and assert the endpoint query budget is respected"""
+        with self.assertNumQueries(QUERY_BUDGETS[endpoint]):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return response
+
+    def test_recipe_list_budget(self):
+        """Test listing recipes uses a constant number of queries"""
+        self.create_recipes(1)
+        self.assertWithinBudget('recipe-list', RECIPE_LIST_URL)
+
+        self.create_recipes(10)
+        response = self.assertWithinBudget('recipe-list', RECIPE_LIST_URL)
+
+        self.assertEqual(len(response.data), 11)
+
+    def test_recipe_paginated_list_budget(self):
+        """Test a page of recipes uses a constant number of queries"""
+        self.create_recipes(10)
+
+        response = self.assertWithinBudget(
+            'recipe-list', RECIPE_LIST_URL, {'page_size': 5}
+        )
+
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_recipe_detail_budget(self):
+        """Test retrieving a recipe uses a constant number of queries"""
+        recipe = self.create_recipes(1)[0]
+
+        response = self.assertWithinBudget(
+            'recipe-detail', recipe_detail_url(recipe.id)
+        )
+
+        self.assertEqual(len(response.data['tags']), 2)
+        self.assertEqual(len(response.data['ingredients']), 2)
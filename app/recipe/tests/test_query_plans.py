@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+
+TAGS_LIST_URL = reverse('recipe:tag-list')
+RECIPE_LIST_URL = reverse('recipe:recipe-list')
+
+
+class QueryPlanTests(TestCase):
+    """Test that list queries are answered from indexes at scale"""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [
+            get_user_model().objects.create_user(email=f'user{i}@email.com')
+            for i in range(20)
+        ]
+        cls.user = users[0]
+        for user in users:
+            tags = Tag.objects.bulk_create(
+                [Tag(user=user, name=f'Tag {i}') for i in range(200)]
+            )
+            recipes = Recipe.objects.bulk_create([
+                Recipe(user=user, title=f'Recipe {i}', time_minutes=5,
+                       price=1)
+                for i in range(2000 if user == cls.user else 600)
+            ])
+            # Only half of the tags are ever assigned
+            Recipe.tags.through.objects.bulk_create([
+                Recipe.tags.through(
+                    recipe_id=recipe.id, tag_id=tags[(i + j * 7) % 100].id
+                )
+                for i, recipe in enumerate(recipes)
+                for j in range(3)
+            ])
+        with connection.cursor() as cursor:
+            for model in (Tag, Recipe, Recipe.tags.through):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def explain(self, url, params, table):
+        """Return the plan of the query an endpoint runs on table"""
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url, params)
+        sql = next(
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith(f'SELECT "{table}".')
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}')
+            return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def test_tags_listed_in_index_order(self):
+        """Test that tags are read in order from the (user, name) index"""
+        plan = self.explain(TAGS_LIST_URL, {'page_size': 20}, 'core_tag')
+
+        self.assertIn('Index Scan Backward using unique_tag_name_per_user',
+                      plan)
+        self.assertNotIn('Sort', plan)
+
+    def test_assigned_tags_semi_join(self):
+        """Test that assigned_only is a semi-join without deduplication"""
+        plan = self.explain(
+            TAGS_LIST_URL, {'assigned_only': 1, 'page_size': 20}, 'core_tag'
+        )
+
+        self.assertIn('Semi Join', plan)
+        self.assertIn('unique_tag_name_per_user', plan)
+        for step in ('Unique', 'Aggregate', 'Sort'):
+            self.assertNotIn(step, plan)
+
+    def test_recipes_listed_in_index_order(self):
+        """Test that recipe pages are read in order from (user, id)"""
+        plan = self.explain(
+            RECIPE_LIST_URL, {'page_size': 20}, 'core_recipe'
+        )
+
+        self.assertIn('core_recipe_user_id_bf8313_idx', plan)
+        self.assertNotIn('Sort', plan)
@@ -1,17 +1,30 @@
+import csv
+import hashlib
+import io
+import json
 import tempfile
+import threading
 import os
 
+from unittest.mock import ANY, patch
+
 from PIL import Image
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
-from core.models import Recipe, Tag, Ingredient
+from core.models import Recipe, Tag, Ingredient, RecipeImageUpload
+from recipe.renditions import generate_renditions
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.uploads import chunk_lock, discard_upload
 
 
 def image_upload_url(recipe_id):
@@ -19,9 +32,38 @@ def image_upload_url(recipe_id):
     return reverse('recipe:recipe-upload-image', args=[recipe_id])
 
 
+def upload_sessions_url(recipe_id):
+    """Return the URL starting a resumable image upload"""
+    return reverse('recipe:recipe-upload-sessions', args=[recipe_id])
+
+
+def upload_detail_url(upload_id):
+    """Return the URL of a resumable upload"""
+    return reverse('recipe:upload-detail', args=[upload_id])
+
+
+def upload_chunk_url(upload_id):
+    """Return the URL receiving chunks of a resumable upload"""
+    return reverse('recipe:upload-chunk', args=[upload_id])
+
+
+def upload_finalize_url(upload_id):
+    """Return the URL completing a resumable upload"""
+    return reverse('recipe:upload-finalize', args=[upload_id])
+
+
 # /api/recipe/recipes
 RECIPE_LIST_URL = reverse('recipe:recipe-list')
 
+# /api/recipe/recipes/bulk/
+RECIPE_BULK_URL = reverse('recipe:recipe-bulk')
+
+# /api/recipe/recipes/export/
+RECIPE_EXPORT_URL = reverse('recipe:recipe-export')
+
+# /api/recipe/recipes/facets/
+RECIPE_FACETS_URL = reverse('recipe:recipe-facets')
+
 
 # /api/recipe/recipes/1/
 def recipe_detail_URL(recipe_id):
@@ -282,6 +324,381 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(serializer2.data, response.data)
         self.assertNotIn(serializer3.data, response.data)
 
+    def test_filter_recipes_matching_all_tags(self):
+        """Test filtering recipes that have every requested tag"""
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Dessert')
+        recipe1 = sample_recipe(user=self.user, title='Vegan cheesecake')
+        recipe2 = sample_recipe(user=self.user, title='Vegan curry')
+        recipe1.tags.add(tag1, tag2)
+        recipe2.tags.add(tag1)
+
+        response = self.client.get(
+            RECIPE_LIST_URL,
+            {'tags': f'{tag1.id},{tag2.id}', 'match': 'all'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data], [recipe1.id]
+        )
+
+    def test_filter_recipes_matching_all_ingredients_and_tags(self):
+        """Test match all applies to both tags and ingredients"""
+        tag = sample_tag(user=self.user)
+        ingredient1 = sample_ingredient(user=self.user, name='Eggs')
+        ingredient2 = sample_ingredient(user=self.user, name='Oats')
+        recipe1 = sample_recipe(user=self.user, title='Pancake')
+        recipe2 = sample_recipe(user=self.user, title='Porridge')
+        recipe1.tags.add(tag)
+        recipe1.ingredients.add(ingredient1, ingredient2)
+        recipe2.ingredients.add(ingredient1, ingredient2)
+
+        response = self.client.get(RECIPE_LIST_URL, {
+            'tags': f'{tag.id}',
+            'ingredients': f'{ingredient1.id},{ingredient2.id}',
+            'match': 'all',
+        })
+
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data], [recipe1.id]
+        )
+
+    def test_filter_recipes_by_tags_returns_distinct(self):
+        """Test a recipe matching several tags is returned once"""
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Dessert')
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(tag1, tag2)
+
+        response = self.client.get(
+            RECIPE_LIST_URL, {'tags': f'{tag1.id},{tag2.id}'}
+        )
+
+        self.assertEqual(len(response.data), 1)
+
+    def test_filter_recipes_invalid_match(self):
+        """Test an unknown match mode is rejected"""
+        response = self.client.get(
+            RECIPE_LIST_URL, {'tags': '1', 'match': 'some'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_recipes_cursor_pagination(self):
+        """Test paging through recipes with a cursor"""
+        recipes = [sample_recipe(user=self.user) for _ in range(3)]
+
+        response = self.client.get(RECIPE_LIST_URL, {'page_size': 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            [recipes[0].id, recipes[1].id]
+        )
+        self.assertIsNone(response.data['previous'])
+
+        response = self.client.get(response.data['next'])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            [recipes[2].id]
+        )
+        self.assertIsNone(response.data['next'])
+        self.assertIsNotNone(response.data['previous'])
+
+    def test_recipes_page_size_capped(self):
+        """Test that the requested page size is capped"""
+        for _ in range(3):
+            sample_recipe(user=self.user)
+
+        with patch(
+            'recipe.pagination.RecipeCursorPagination.max_page_size', 2
+        ):
+            response = self.client.get(RECIPE_LIST_URL, {'page_size': 50})
+
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_search_recipes(self):
+        """Test searching recipes by title, tag and ingredient names"""
+        recipe1 = sample_recipe(user=self.user, title='Lentil soup')
+        recipe2 = sample_recipe(user=self.user, title='Risotto')
+        recipe2.ingredients.add(sample_ingredient(self.user, 'Lentils'))
+        recipe3 = sample_recipe(user=self.user, title='Pancakes')
+        recipe3.tags.add(sample_tag(self.user, 'Soups'))
+        sample_recipe(user=self.user, title='Steak')
+        other_user = get_user_model().objects.create_user(
+            email='user2@email.com', password='testPASS321'
+        )
+        sample_recipe(user=other_user, title='Lentil curry')
+
+        lentil = self.client.get(RECIPE_LIST_URL, {'search': 'lentil'})
+        soup = self.client.get(RECIPE_LIST_URL, {'search': 'soup'})
+
+        self.assertEqual(
+            [item['id'] for item in lentil.data], [recipe1.id, recipe2.id]
+        )
+        self.assertEqual(
+            [item['id'] for item in soup.data], [recipe1.id, recipe3.id]
+        )
+
+    def test_search_recipes_websearch_syntax(self):
+        """Test that search accepts quoted phrases and exclusions"""
+        recipe1 = sample_recipe(user=self.user, title='Red lentil curry')
+        sample_recipe(user=self.user, title='Lentil and red pepper stew')
+
+        phrase = self.client.get(RECIPE_LIST_URL, {'search': '"red lentil"'})
+        excluded = self.client.get(
+            RECIPE_LIST_URL, {'search': 'lentil -stew'}
+        )
+
+        self.assertEqual([item['id'] for item in phrase.data], [recipe1.id])
+        self.assertEqual(
+            [item['id'] for item in excluded.data], [recipe1.id]
+        )
+
+    def test_search_reflects_renamed_and_removed_links(self):
+        """Test that the search index follows tag changes"""
+        recipe = sample_recipe(user=self.user, title='Pancakes')
+        tag = sample_tag(self.user, 'Breakfast')
+        recipe.tags.add(tag)
+
+        tag.name = 'Brunch'
+        tag.save()
+        renamed = self.client.get(RECIPE_LIST_URL, {'search': 'brunch'})
+        tag.recipe_set.clear()
+        cleared = self.client.get(RECIPE_LIST_URL, {'search': 'brunch'})
+
+        self.assertEqual([item['id'] for item in renamed.data], [recipe.id])
+        self.assertEqual(cleared.data, [])
+
+    def test_search_bulk_created_recipes(self):
+        """Test that bulk created recipes are searchable"""
+        tag = sample_tag(user=self.user, name='Vegan')
+        payload = [
+            {'title': 'Soup', 'time_minutes': 30, 'price': '3.00',
+             'tags': [tag.id]},
+        ]
+        ids = self.client.post(
+            RECIPE_BULK_URL, payload, format='json'
+        ).data['ids']
+
+        response = self.client.get(RECIPE_LIST_URL, {'search': 'vegan'})
+
+        self.assertEqual([item['id'] for item in response.data], ids)
+
+    def test_search_paginated_by_rank(self):
+        """Test paging through search results in rank order"""
+        tag = sample_tag(self.user, 'Soup')
+        tagged = [sample_recipe(user=self.user) for _ in range(3)]
+        for recipe in tagged:
+            recipe.tags.add(tag)
+        titled = sample_recipe(user=self.user, title='Soup')
+
+        first = self.client.get(
+            RECIPE_LIST_URL, {'search': 'soup', 'page_size': 2}
+        )
+        second = self.client.get(first.data['next'])
+
+        self.assertEqual(
+            [item['id'] for item in first.data['results']],
+            [titled.id, tagged[2].id]
+        )
+        self.assertEqual(
+            [item['id'] for item in second.data['results']],
+            [tagged[1].id, tagged[0].id]
+        )
+        self.assertIsNone(second.data['next'])
+
+    def test_search_queries(self):
+        """Test that a search page is fetched in a single query"""
+        for i in range(3):
+            sample_recipe(user=self.user, title=f'Soup {i}')
+
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                RECIPE_LIST_URL, {'search': 'soup', 'page_size': 2}
+            )
+
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_recipe_facets(self):
+        """Test counting filtered recipes per tag and ingredient"""
+        vegan = sample_tag(self.user, 'Vegan')
+        dessert = sample_tag(self.user, 'Dessert')
+        sample_tag(self.user, 'Unused')
+        oats = sample_ingredient(self.user, 'Oats')
+        cake = sample_recipe(user=self.user, title='Cake')
+        cake.tags.add(vegan, dessert)
+        cake.ingredients.add(oats)
+        pie = sample_recipe(user=self.user, title='Pie')
+        pie.tags.add(dessert)
+        sample_recipe(user=self.user, title='Soup').tags.add(vegan)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                RECIPE_FACETS_URL, {'tags': dessert.id}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['tags'], [
+            {'id': dessert.id, 'name': 'Dessert', 'count': 2},
+            {'id': vegan.id, 'name': 'Vegan', 'count': 1},
+        ])
+        self.assertEqual(response.data['ingredients'], [
+            {'id': oats.id, 'name': 'Oats', 'count': 1},
+        ])
+
+    def test_recipe_facets_limited_to_user(self):
+        """Test that facets only count the user's recipes"""
+        other_user = get_user_model().objects.create_user(
+            email='user2@email.com', password='testPASS321'
+        )
+        sample_recipe(user=other_user).tags.add(sample_tag(other_user))
+
+        response = self.client.get(RECIPE_FACETS_URL)
+
+        self.assertEqual(response.data, {'tags': [], 'ingredients': []})
+
+    def test_bulk_create_recipes(self):
+        """Test creating many recipes in one request"""
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        payload = [
+            {
+                'title': 'Pancake',
+                'time_minutes': 20,
+                'price': '5.00',
+                'tags': [tag.id],
+                'ingredients': [ingredient.id],
+            },
+            {'title': 'Soup', 'time_minutes': 30, 'price': '3.00'},
+        ]
+
+        response = self.client.post(RECIPE_BULK_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        recipes = Recipe.objects.filter(id__in=response.data['ids'])
+        self.assertEqual(recipes.count(), 2)
+        pancake = recipes.get(title='Pancake')
+        self.assertEqual(list(pancake.tags.all()), [tag])
+        self.assertEqual(list(pancake.ingredients.all()), [ingredient])
+        self.assertTrue(all(recipe.user == self.user for recipe in recipes))
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 1)
+
+    def test_bulk_create_queries_independent_of_size(self):
+        """Test that bulk creation uses a fixed number of queries"""
+        tag = sample_tag(user=self.user)
+        payload = [
+            {
+                'title': f'Recipe {i}',
+                'time_minutes': 10,
+                'price': '5.00',
+                'tags': [tag.id],
+            } for i in range(50)
+        ]
+
+        with self.assertNumQueries(8):
+            response = self.client.post(
+                RECIPE_BULK_URL, payload, format='json'
+            )
+
+        self.assertEqual(len(response.data['ids']), 50)
+
+    def test_bulk_create_rejects_other_users_tags(self):
+        """Test that recipes cannot be linked to another user's tags"""
+        user2 = get_user_model().objects.create_user(
+            email='user2@email.com',
+            password='testPASS321'
+        )
+        tag = sample_tag(user=user2)
+        payload = [{
+            'title': 'Pancake',
+            'time_minutes': 20,
+            'price': '5.00',
+            'tags': [tag.id],
+        }]
+
+        response = self.client.post(RECIPE_BULK_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_create_invalid_item(self):
+        """Test that one invalid recipe rejects the whole batch"""
+        payload = [
+            {'title': 'Pancake', 'time_minutes': 20, 'price': '5.00'},
+            {'title': 'Soup', 'price': '3.00'},
+        ]
+
+        response = self.client.post(RECIPE_BULK_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def create_export_recipes(self):
+        """Create recipes for the export tests"""
+        tag = sample_tag(user=self.user, name='Vegan')
+        ingredient = sample_ingredient(user=self.user, name='Oats')
+        recipes = [
+            sample_recipe(user=self.user, title=f'Recipe {i}')
+            for i in range(3)
+        ]
+        recipes[0].tags.add(tag)
+        recipes[0].ingredients.add(ingredient)
+        sample_recipe(
+            user=get_user_model().objects.create_user(
+                email='user2@email.com', password='testPASS321'
+            )
+        )
+
+        return recipes
+
+    @override_settings(RECIPE_EXPORT_CHUNK_SIZE=2)
+    def test_export_recipes_ndjson(self):
+        """Test streaming the user's recipes as NDJSON"""
+        recipes = self.create_export_recipes()
+
+        response = self.client.get(RECIPE_EXPORT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual([row['id'] for row in rows],
+                         [recipe.id for recipe in recipes])
+        self.assertEqual(rows[0]['tags'], ['Vegan'])
+        self.assertEqual(rows[0]['ingredients'], ['Oats'])
+        self.assertEqual(rows[0]['price'], '5.00')
+        self.assertEqual(rows[1]['tags'], [])
+
+    def test_export_recipes_csv(self):
+        """Test streaming the user's recipes as CSV"""
+        recipes = self.create_export_recipes()
+
+        response = self.client.get(
+            RECIPE_EXPORT_URL, {'export_format': 'csv'}
+        )
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        content = b''.join(response.streaming_content).decode()
+        rows = list(csv.DictReader(content.splitlines()))
+        self.assertEqual(len(rows), len(recipes))
+        self.assertEqual(rows[0]['title'], 'Recipe 0')
+        self.assertEqual(rows[0]['tags'], 'Vegan')
+
+    def test_export_recipes_invalid_format(self):
+        """Test that an unknown export format is rejected"""
+        response = self.client.get(
+            RECIPE_EXPORT_URL, {'export_format': 'xml'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class RecipeImageUploadTests(TestCase):
     """Test uploading an image to a recipe"""
@@ -317,9 +734,269 @@ class RecipeImageUploadTests(TestCase):
         self.assertIn('image', response.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def test_upload_image_schedules_renditions(self):
+        """Test uploading an image queues rendition generation"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (10, 10)).save(ntf, 'JPEG')
+            ntf.seek(0)
+            with patch('recipe.renditions.executor') as executor, \
+                    self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    url, {'image': ntf}, format='multipart'
+                )
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(response.data['image_status'], 'pending')
+        executor.submit.assert_called_once_with(
+            ANY, self.recipe.id, self.recipe.image.name
+        )
+
+    @override_settings(RECIPE_IMAGE_RENDITIONS={'thumbnail': (20, 20)})
+    def test_generate_renditions(self):
+        """Test generating the renditions of an uploaded image"""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (100, 50)).save(ntf, 'JPEG')
+            ntf.seek(0)
+            self.recipe.image.save('photo.jpg', ntf)
+
+        generate_renditions(self.recipe.id, self.recipe.image.name)
+
+        self.recipe.refresh_from_db()
+        path = self.recipe.image_renditions['thumbnail']
+        self.addCleanup(default_storage.delete, path)
+        self.assertEqual(self.recipe.image_status, 'ready')
+        with default_storage.open(path) as f:
+            self.assertEqual(Image.open(f).size, (20, 10))
+
+        response = self.client.get(recipe_detail_URL(self.recipe.id))
+        self.assertEqual(
+            response.data['image_renditions'],
+            {'thumbnail': default_storage.url(path)}
+        )
+
+    @override_settings(RECIPE_IMAGE_RENDITIONS={'thumbnail': (20, 20)})
+    def test_shared_renditions_not_rewritten(self):
+        """Test that recipes with the same image reuse its renditions"""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (100, 50), 'red').save(ntf, 'JPEG')
+            ntf.seek(0)
+            self.recipe.image.save('photo.jpg', ntf)
+        generate_renditions(self.recipe.id, self.recipe.image.name)
+        self.recipe.refresh_from_db()
+        path = self.recipe.image_renditions['thumbnail']
+        self.addCleanup(default_storage.delete, path)
+        written = os.stat(default_storage.path(path))
+
+        other = sample_recipe(user=self.user, image=self.recipe.image.name)
+        with patch('recipe.renditions.open_original') as open_original:
+            generate_renditions(other.id, other.image.name)
+
+        open_original.assert_not_called()
+        other.refresh_from_db()
+        self.assertEqual(other.image_renditions, {'thumbnail': path})
+        self.assertEqual(other.image_status, 'ready')
+        self.assertEqual(
+            os.stat(default_storage.path(path)).st_ino, written.st_ino
+        )
+
+    def test_generate_renditions_invalid_image(self):
+        """Test that a broken image marks the renditions as failed"""
+        self.recipe.image.save('photo.jpg', ContentFile(b'noimage'))
+
+        generate_renditions(self.recipe.id, self.recipe.image.name)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, 'failed')
+
     def test_upload_invalid_image_to_recipe(self):
         """Test uploading an invalid image to a recipe"""
         url = image_upload_url(self.recipe.id)
         payload = {'image': 'noimage'}
         response = self.client.post(url, payload, format='multipart')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeResumableUploadTests(TestCase):
+    """Test uploading recipe images in resumable chunks"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='testuser@email.com',
+            password='testPASS123'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user)
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (10, 10)).save(buffer, 'JPEG')
+        self.content = buffer.getvalue()
+
+    def tearDown(self):
+        for upload in RecipeImageUpload.objects.all():
+            discard_upload(upload)
+        self.recipe.refresh_from_db()
+        self.recipe.image.delete()
+
+    def start_upload(self, content=None, **params):
+        """Create an upload session and return its data"""
+        content = content or self.content
+        payload = {
+            'filename': 'photo.jpg',
+            'size': len(content),
+            'sha256': hashlib.sha256(content).hexdigest(),
+        }
+        payload.update(params)
+
+        return self.client.post(
+            upload_sessions_url(self.recipe.id), payload, format='json'
+        )
+
+    def put_chunk(self, upload_id, offset, data):
+        """Send a chunk of the upload"""
+        return self.client.put(
+            upload_chunk_url(upload_id) + f'?offset={offset}',
+            data=data,
+            content_type='application/octet-stream',
+        )
+
+    def test_resumable_upload(self):
+        """Test uploading an image in chunks, resuming after a retry"""
+        upload_id = self.start_upload().data['id']
+        half = len(self.content) // 2
+
+        self.put_chunk(upload_id, 0, self.content[:half])
+        response = self.put_chunk(upload_id, 0, self.content[:half])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['offset'], half)
+        response = self.client.get(upload_detail_url(upload_id))
+        self.assertEqual(response.data['offset'], half)
+
+        self.put_chunk(upload_id, half, self.content[half:])
+        response = self.client.post(upload_finalize_url(upload_id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['image_status'], 'pending')
+        self.recipe.refresh_from_db()
+        with self.recipe.image.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertFalse(RecipeImageUpload.objects.exists())
+
+    def test_chunk_leaving_gap_rejected(self):
+        """Test that a chunk past the received offset is rejected"""
+        upload_id = self.start_upload().data['id']
+
+        response = self.put_chunk(upload_id, 10, self.content[10:20])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['offset'], 0)
+
+    def test_concurrent_chunk_rejected(self):
+        """Test that a chunk sent while another is written is rejected"""
+        upload = RecipeImageUpload.objects.get(
+            pk=self.start_upload().data['id']
+        )
+        locked, done = threading.Event(), threading.Event()
+
+        def write_other_chunk():
+            try:
+                with chunk_lock(upload):
+                    locked.set()
+                    done.wait(10)
+            finally:
+                connection.close()
+
+        writer = threading.Thread(target=write_other_chunk)
+        writer.start()
+        locked.wait(10)
+        try:
+            response = self.put_chunk(upload.id, 0, self.content[:20])
+        finally:
+            done.set()
+            writer.join()
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['offset'], 0)
+        response = self.put_chunk(upload.id, 0, self.content[:20])
+        self.assertEqual(response.data['offset'], 20)
+
+    def test_negative_chunk_offset_rejected(self):
+        """Test that a chunk before the start of the file is rejected"""
+        upload_id = self.start_upload().data['id']
+
+        response = self.put_chunk(upload_id, -5, self.content[:10])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('offset', response.data)
+
+    def test_chunk_exceeding_size_rejected(self):
+        """Test that data beyond the declared size is rejected"""
+        upload_id = self.start_upload().data['id']
+
+        response = self.put_chunk(upload_id, 0, self.content + b'extra')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_finalize_incomplete_upload(self):
+        """Test that an incomplete upload cannot be finalized"""
+        upload_id = self.start_upload().data['id']
+        self.put_chunk(upload_id, 0, self.content[:10])
+
+        response = self.client.post(upload_finalize_url(upload_id))
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_finalize_checksum_mismatch(self):
+        """Test that a corrupted upload is restarted for the client"""
+        upload_id = self.start_upload().data['id']
+        corrupt = bytes([self.content[0] ^ 1]) + self.content[1:]
+        self.put_chunk(upload_id, 0, corrupt)
+
+        response = self.client.post(upload_finalize_url(upload_id))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['offset'], 0)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+        self.put_chunk(upload_id, 0, self.content)
+        response = self.client.post(upload_finalize_url(upload_id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_partial_files_not_public(self):
+        """Test that partial uploads are kept outside the media root"""
+        upload = RecipeImageUpload.objects.get(
+            pk=self.start_upload().data['id']
+        )
+
+        self.assertTrue(os.path.exists(upload.path))
+        self.assertFalse(os.path.abspath(upload.path).startswith(
+            os.path.abspath(settings.MEDIA_ROOT) + os.sep
+        ))
+
+    def test_finalize_twice(self):
+        """Test that an upload is attached by a single finalize call"""
+        upload_id = self.start_upload().data['id']
+        self.put_chunk(upload_id, 0, self.content)
+
+        with patch('recipe.views.schedule_renditions') as schedule:
+            first = self.client.post(upload_finalize_url(upload_id))
+            second = self.client.post(upload_finalize_url(upload_id))
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_404_NOT_FOUND)
+        schedule.assert_called_once()
+
+    def test_upload_limited_to_user(self):
+        """Test that other users cannot write to an upload"""
+        upload_id = self.start_upload().data['id']
+        user2 = get_user_model().objects.create_user(
+            email='user2@email.com',
+            password='testPASS321'
+        )
+        self.client.force_authenticate(user2)
+
+        response = self.put_chunk(upload_id, 0, self.content)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
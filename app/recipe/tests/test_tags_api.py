@@ -7,10 +7,13 @@ from rest_framework.test import APIClient
 from rest_framework.validators import ValidationError
 
 from core.models import Tag, Recipe
+from recipe.autocomplete import autocomplete_cache
 from recipe.serializers import TagSerializer
 
 
 TAGS_LIST_URL = reverse('recipe:tag-list')
+TAGS_BATCH_URL = reverse('recipe:tag-batch')
+TAGS_AUTOCOMPLETE_URL = reverse('recipe:tag-autocomplete')
 
 
 class PublicTagsApiTests(TestCase):
@@ -35,6 +38,7 @@ class PrivateTagsApiTests(TestCase):
             password='testPASS123'
         )
         self.client.force_authenticate(self.user)
+        autocomplete_cache.clear()
 
     def test_retrieve_tags(self):
         """Test retrieving tags"""
@@ -130,3 +134,229 @@ class PrivateTagsApiTests(TestCase):
         response = self.client.get(TAGS_LIST_URL, {'assigned_only': 1})
 
         self.assertEqual(len(response.data), 1)
+
+    def test_retrieve_tags_assigned_boolean_words(self):
+        """Test that assigned_only accepts true and rejects other words"""
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        Tag.objects.create(user=self.user, name='Lunch')
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Pancake',
+            time_minutes=20,
+            price=2.00
+        )
+        recipe.tags.add(tag)
+
+        response = self.client.get(TAGS_LIST_URL, {'assigned_only': 'true'})
+        invalid = self.client.get(TAGS_LIST_URL, {'assigned_only': 'yes'})
+
+        self.assertEqual([item['name'] for item in response.data], [tag.name])
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('assigned_only', invalid.data)
+
+    def test_retrieve_tags_cursor_pagination(self):
+        """Test paging through tags ordered by name"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Dessert')
+        Tag.objects.create(user=self.user, name='Breakfast')
+
+        response = self.client.get(TAGS_LIST_URL, {'page_size': 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [tag['name'] for tag in response.data['results']],
+            ['Vegan', 'Dessert']
+        )
+
+        response = self.client.get(response.data['next'])
+
+        self.assertEqual(
+            [tag['name'] for tag in response.data['results']],
+            ['Breakfast']
+        )
+        self.assertIsNone(response.data['next'])
+
+    def test_retrieve_tags_not_modified(self):
+        """Test that an unchanged tag list answers 304"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        response = self.client.get(TAGS_LIST_URL)
+
+        response = self.client.get(
+            TAGS_LIST_URL, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertIsNone(response.data)
+
+    def test_retrieve_tags_modified_after_create(self):
+        """Test that creating a tag changes the list ETag"""
+        etag = self.client.get(TAGS_LIST_URL)['ETag']
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        response = self.client.get(TAGS_LIST_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data), 1)
+
+    def test_retrieve_assigned_tags_modified_after_assignment(self):
+        """Test that assigning a tag to a recipe changes the list ETag"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Vegan curry',
+            time_minutes=20,
+            price=2.00,
+        )
+        params = {'assigned_only': 1}
+        etag = self.client.get(TAGS_LIST_URL, params)['ETag']
+        recipe.tags.add(tag)
+
+        response = self.client.get(
+            TAGS_LIST_URL, params, HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+
+    def test_create_duplicate_tag_invalid(self):
+        """Test creating a tag with an existing name fails"""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        response = self.client.post(TAGS_LIST_URL, {'name': 'Vegan'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_batch_get_or_create_tags(self):
+        """Test getting ids for names and creating the missing tags"""
+        existing = Tag.objects.create(user=self.user, name='Vegan')
+        payload = {'names': ['Vegan', 'Dessert', 'Dessert']}
+
+        with self.assertNumQueries(2):
+            response = self.client.post(
+                TAGS_BATCH_URL, payload, format='json'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        tags = {tag['name']: tag for tag in response.data}
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(tags['Vegan']['id'], existing.id)
+        self.assertFalse(tags['Vegan']['created'])
+        self.assertTrue(tags['Dessert']['created'])
+        self.assertTrue(
+            Tag.objects.filter(
+                user=self.user, id=tags['Dessert']['id'], name='Dessert'
+            ).exists()
+        )
+
+    def test_batch_get_or_create_tags_per_user(self):
+        """Test that other users' tags with the same name are not used"""
+        user2 = get_user_model().objects.create_user(
+            email='user2@email.com',
+            password='TestPass456',
+        )
+        other = Tag.objects.create(user=user2, name='Vegan')
+
+        response = self.client.post(
+            TAGS_BATCH_URL, {'names': ['Vegan']}, format='json'
+        )
+
+        self.assertNotEqual(response.data[0]['id'], other.id)
+        self.assertTrue(response.data[0]['created'])
+
+    def test_batch_get_or_create_tags_invalid(self):
+        """Test that an empty list of names is rejected"""
+        response = self.client.post(
+            TAGS_BATCH_URL, {'names': []}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_autocomplete_tags(self):
+        """Test that tags starting with a prefix are suggested in order"""
+        for name in ('Vegetarian', 'vegan', 'Dessert', 'Veggie'):
+            Tag.objects.create(user=self.user, name=name)
+        user2 = get_user_model().objects.create_user(
+            email='user2@email.com',
+            password='TestPass456',
+        )
+        Tag.objects.create(user=user2, name='Vegetables')
+
+        response = self.client.get(
+            TAGS_AUTOCOMPLETE_URL, {'q': 'VEG', 'limit': 2}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [tag['name'] for tag in response.data], ['vegan', 'Vegetarian']
+        )
+
+    def test_autocomplete_tags_cached_until_created(self):
+        """Test that suggestions are cached until a tag is added"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(TAGS_AUTOCOMPLETE_URL, {'q': 've'})
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(TAGS_AUTOCOMPLETE_URL, {'q': 've'})
+        self.client.post(TAGS_LIST_URL, {'name': 'Veggie'})
+        response = self.client.get(TAGS_AUTOCOMPLETE_URL, {'q': 've'})
+
+        self.assertEqual([tag['name'] for tag in cached.data], ['Vegan'])
+        self.assertEqual(
+            [tag['name'] for tag in response.data], ['Vegan', 'Veggie']
+        )
+
+    def test_autocomplete_tags_fuzzy(self):
+        """Test that fuzzy mode adds similar names after prefix matches"""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Dessert')
+
+        strict = self.client.get(TAGS_AUTOCOMPLETE_URL, {'q': 'vgan'})
+        fuzzy = self.client.get(
+            TAGS_AUTOCOMPLETE_URL, {'q': 'vgan', 'fuzzy': 'true'}
+        )
+
+        self.assertEqual(strict.data, [])
+        self.assertEqual(fuzzy.data, [{'id': vegan.id, 'name': 'Vegan'}])
+
+    def test_autocomplete_tags_invalid_fuzzy(self):
+        """Test that a fuzzy flag other than 0, 1, true or false is rejected"""
+        response = self.client.get(
+            TAGS_AUTOCOMPLETE_URL, {'q': 've', 'fuzzy': 'yes'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fuzzy', response.data)
+
+    def test_autocomplete_tags_invalid_limit(self):
+        """Test that a non positive limit is rejected"""
+        response = self.client.get(
+            TAGS_AUTOCOMPLETE_URL, {'q': 've', 'limit': 0}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_tags_with_counts(self):
+        """Test that recipe counts are only listed when asked for"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        for title in ('Cake', 'Pie'):
+            Recipe.objects.create(
+                user=self.user, title=title, time_minutes=5, price=1.00
+            ).tags.add(tag)
+
+        plain = self.client.get(TAGS_LIST_URL)
+        with self.assertNumQueries(2):
+            counted = self.client.get(TAGS_LIST_URL, {'with_counts': 'true'})
+
+        self.assertNotIn('recipe_count', plain.data[0])
+        self.assertEqual(counted.data, [
+            {'id': tag.id, 'name': 'Vegan', 'recipe_count': 2}
+        ])
+
+    def test_retrieve_tags_invalid_with_counts(self):
+        """Test that an invalid with_counts flag is rejected"""
+        response = self.client.get(TAGS_LIST_URL, {'with_counts': 'yes'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('with_counts', response.data)
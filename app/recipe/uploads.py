@@ -0,0 +1,103 @@
+import hashlib
+import os
+from contextlib import contextmanager
+
+from django.core.files import File
+from django.db import connection
+from django.utils import timezone
+from PIL import Image
+
+from core.models import Recipe
+
+
+BLOCK_SIZE = 64 * 1024
+
+
+def start_upload(upload):
+    """Create the empty partial file of a new upload session"""
+    os.makedirs(os.path.dirname(upload.path), exist_ok=True)
+    open(upload.path, 'wb').close()
+
+
+@contextmanager
+def chunk_lock(upload):
+    """Hold the lock on writing chunks of an upload, if free
+
+    Yields whether the lock was taken. A session level advisory lock, so no
+    transaction stays open while a slow client streams its chunk.
+    """
+    key = upload.id.int >> 65
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_lock(%s)', [key])
+        locked = cursor.fetchone()[0]
+    try:
+        yield locked
+    finally:
+        if locked:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [key])
+
+
+def write_chunk(upload, stream, offset, length):
+    """Copy length bytes of stream into the partial file at offset"""
+    with open(upload.path, 'r+b') as f:
+        f.seek(offset)
+        remaining = length
+        while remaining:
+            block = stream.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            f.write(block)
+            remaining -= len(block)
+
+    return length - remaining
+
+
+def file_sha256(path):
+    """Return the hex SHA-256 digest of a file, reading it in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def is_image(path):
+    """Return whether Pillow recognises the file as an intact image"""
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except Exception:
+        return False
+
+    return True
+
+
+def attach_upload(upload):
+    """Store a completed upload as the recipe image"""
+    recipe = upload.recipe
+    with open(upload.path, 'rb') as f:
+        recipe.image.save(upload.filename, File(f), save=False)
+    recipe.image_status = Recipe.ImageStatus.PENDING
+    recipe.image_renditions = {}
+    recipe.image_queued = timezone.now()
+    recipe.save(update_fields=[
+        'image', 'image_status', 'image_renditions', 'image_queued'
+    ])
+
+    return recipe
+
+
+def restart_upload(upload):
+    """Empty an upload, so the client sends the file again"""
+    open(upload.path, 'wb').close()
+    upload.offset = 0
+    upload.save(update_fields=['offset'])
+
+
+def discard_upload(upload):
+    """Delete an upload session and its partial file"""
+    if os.path.exists(upload.path):
+        os.remove(upload.path)
+    upload.delete()
@@ -9,6 +9,9 @@ router = DefaultRouter()
 router.register('tags', views.TagViewSet, basename='tag')
 router.register('ingredients', views.IngredientViewSet, basename='ingredient')
 router.register('recipes', views.RecipeViewSet, basename='recipe')
+router.register(
+    'uploads', views.RecipeImageUploadViewSet, basename='upload'
+)
 
 app_name = 'recipe'
 
@@ -1,76 +1,306 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, FloatField, OuterRef
+from django.db.models.functions import Cast
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+from django.utils.translation import gettext_lazy as _
 from rest_framework import mixins, viewsets, status
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
 
-from core.models import Tag, Ingredient, Recipe
-from . import serializers
+from core import routers
+from core.authentication import CachedTokenAuthentication
+from core.middleware import SerializerTimingMixin, timed_serializer
+from core.models import (
+    Tag, Ingredient, Recipe, RecipeAttrVersion, RecipeImageUpload
+)
+from . import serializers, uploads
+from .autocomplete import autocomplete_cache
+from .export import EXPORT_FORMATS, export_rows
+from .pagination import (
+    RecipeAttrCursorPagination, RecipeCursorPagination,
+    RecipeSearchCursorPagination
+)
+from .renditions import schedule_renditions
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+MATCH_MODES = ('any', 'all')
+BOOLEAN_PARAMS = {'0': False, 'false': False, '1': True, 'true': True}
+
+
+class ReplicaReadMixin:
+    """Read from a replica on safe requests unless the user just wrote
+
+    Successful writes pin the user to the primary for a while, so they
+    read their own changes even while the replicas lag behind.
+    """
+    read_from_replica = True
+    _read_alias_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (settings.DATABASE_REPLICAS and self.read_from_replica
+                and request.method in SAFE_METHODS
+                and not routers.is_pinned(request, request.user.pk)):
+            self._read_alias_token = routers.set_read_alias(
+                routers.choose_replica()
+            )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS
+                and response.status_code < 400):
+            routers.pin_to_primary(response, request.user.pk)
+
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self._read_alias_token is not None:
+                routers.reset_read_alias(self._read_alias_token)
+                self._read_alias_token = None
+
+
+class BaseRecipeAttrViewSet(ReplicaReadMixin,
+                            SerializerTimingMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     """Base viewset for user owned recipe attributes"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeAttrCursorPagination
 
     def get_queryset(self):
         """Return objects for authenticated user only"""
-        assigned_only = bool(
-            int(self.request.query_params.get('assigned_only', 0))
-        )
+        assigned_only = self._bool_param('assigned_only')
         queryset = self.queryset
 
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            # A semi-join stops at the first link instead of joining every
+            # recipe and deduplicating the result
+            field = queryset.model._meta.model_name
+            links = getattr(Recipe, f'{field}s').through.objects.filter(
+                **{f'{field}_id': OuterRef('pk')}
+            )
+            queryset = queryset.filter(Exists(links))
+
+        return queryset.filter(user=self.request.user).order_by('-name')
+
+    def _bool_param(self, name):
+        """Return a query parameter given as 0, 1, true or false"""
+        value = self.request.query_params.get(name, '0').lower()
+        if value not in BOOLEAN_PARAMS:
+            raise ValidationError(
+                {name: _('Must be one of: %s') % ', '.join(BOOLEAN_PARAMS)}
+            )
+
+        return BOOLEAN_PARAMS[value]
+
+    def get_list_etag(self):
+        """Return the ETag of the authenticated user's list, if known"""
+        version = RecipeAttrVersion.objects.current(
+            self.request.user, self.queryset.model._meta.model_name
+        )
+        if version is None:
+            return None
+        return quote_etag(f'{self.request.user.pk}-{version}')
+
+    def list(self, request, *args, **kwargs):
+        """List objects, answering 304 when the client copy is current"""
+        etag = self.get_list_etag()
+        if etag is not None and etag in parse_etags(
+                request.META.get('HTTP_IF_NONE_MATCH', '')):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED,
+                headers={'ETag': etag}
+            )
+
+        response = super().list(request, *args, **kwargs)
+        if etag is not None:
+            response['ETag'] = etag
+        return response
+
+    def get_serializer_class(self):
+        """Return appropriate serializer class"""
+        if self.action == 'batch':
+            return serializers.RecipeAttrBatchSerializer
+        elif self.action == 'list' and self._bool_param('with_counts'):
+            return self.count_serializer_class
 
-        return queryset.filter(
-            user=self.request.user).order_by('-name').distinct()
+        return self.serializer_class
 
     def perform_create(self, serializer):
         """Create a new object"""
-        serializer.save(user=self.request.user)
+        try:
+            with transaction.atomic():
+                serializer.save(user=self.request.user)
+        except IntegrityError:
+            raise ValidationError({'name': _('This name already exists')})
+
+    @action(methods=['POST'], detail=False, url_path='batch')
+    def batch(self, request):
+        """Return objects for the given names, creating missing ones"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = self.queryset.model.objects.get_or_create_many(
+            request.user, serializer.validated_data['names']
+        )
+
+        serializer_class = timed_serializer(self.serializer_class)
+        context = self.get_serializer_context()
+        return Response(
+            data=[
+                {
+                    **serializer_class(obj, context=context).data,
+                    'created': created
+                }
+                for obj, created in results
+            ],
+            status=status.HTTP_200_OK
+        )
+
+    @action(methods=['GET'], detail=False, url_path='autocomplete')
+    def autocomplete(self, request):
+        """Return names starting with ?q=, then similar ones if ?fuzzy=1"""
+        prefix = request.query_params.get('q', '').strip()
+        fuzzy = self._bool_param('fuzzy')
+        try:
+            limit = int(request.query_params.get(
+                'limit', settings.RECIPE_AUTOCOMPLETE_LIMIT
+            ))
+            if limit < 1:
+                raise ValueError
+        except ValueError:
+            raise ValidationError({'limit': _('Must be a positive integer')})
+        limit = min(limit, settings.RECIPE_AUTOCOMPLETE_MAX_LIMIT)
+
+        field = self.queryset.model._meta.model_name
+        index = autocomplete_cache.get(
+            (request.user.pk, field),
+            RecipeAttrVersion.objects.current(request.user, field),
+            lambda: self.queryset.filter(
+                user=request.user).values_list('id', 'name'),
+        )
+        results = index.prefix(prefix, limit)
+        if fuzzy and len(results) < limit:
+            results += index.similar(
+                prefix,
+                limit - len(results),
+                settings.RECIPE_AUTOCOMPLETE_SIMILARITY,
+                exclude={pk for pk, _ in results},
+            )
+
+        return Response(
+            data=[{'id': pk, 'name': name} for pk, name in results],
+            status=status.HTTP_200_OK
+        )
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """Manage tags in the database"""
     serializer_class = serializers.TagSerializer
+    count_serializer_class = serializers.TagCountSerializer
     queryset = Tag.objects.all()
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """Manage ingredients in the database"""
     serializer_class = serializers.IngredientSerializer
+    count_serializer_class = serializers.IngredientCountSerializer
     queryset = Ingredient.objects.all()
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, SerializerTimingMixin,
+                    viewsets.ModelViewSet):
     """Manage recipes in the database"""
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeCursorPagination
 
     def _params_to_ints(self, qs):
         """Converting a list of string ids to a list of integers"""
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _filter_by_related(self, queryset, field, ids, match):
+        """Filter recipes linked to any or all of the related ids
+
+        Uses a subquery on the m2m table instead of a join, so recipes
+        matching several ids are never duplicated.
+        """
+        ids = set(ids)
+        related_id = f'{field}_id'
+        links = getattr(Recipe, f'{field}s').through.objects.filter(
+            **{f'{related_id}__in': ids}
+        ).values('recipe_id')
+
+        if match == 'all':
+            links = links.annotate(
+                matched=Count(related_id, distinct=True)
+            ).filter(matched=len(ids))
+
+        return queryset.filter(id__in=links.values('recipe_id'))
+
+    def _search(self):
+        """Return the search terms of the request, if any"""
+        return self.request.query_params.get('search', '').strip()
+
+    @property
+    def paginator(self):
+        """Page search results by rank instead of id"""
+        if not hasattr(self, '_paginator') and self._search():
+            self._paginator = RecipeSearchCursorPagination()
+
+        return super().paginator
+
     def get_queryset(self):
         """Return recipe for authenticated user only"""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        match = self.request.query_params.get('match', 'any')
+        search = self._search()
         queryset = self.queryset
 
+        if match not in MATCH_MODES:
+            raise ValidationError(
+                {'match': _('Must be one of: %s') % ', '.join(MATCH_MODES)}
+            )
+
         if tags is not None:
             tags_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tags_ids)
+            queryset = self._filter_by_related(
+                queryset, 'tag', tags_ids, match)
 
         if ingredients is not None:
             ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            queryset = self._filter_by_related(
+                queryset, 'ingredient', ingredient_ids, match)
+
+        queryset = queryset.filter(user=self.request.user).prefetch_related(
+            'tags', 'ingredients')
 
-        return queryset.filter(user=self.request.user)
+        if search:
+            query = SearchQuery(
+                search,
+                config=settings.RECIPE_SEARCH_CONFIG,
+                search_type='websearch',
+            )
+            # ts_rank returns a real, whose text form would not round trip
+            # through the cursor position exactly
+            return queryset.filter(search_vector=query).annotate(
+                rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+            ).order_by('-rank', '-id')
+
+        return queryset.order_by('-id')
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -78,6 +308,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return serializers.RecipeDetailSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
+        elif self.action == 'bulk':
+            return serializers.RecipeBulkSerializer
+        elif self.action == 'upload_sessions':
+            return serializers.RecipeImageUploadSerializer
 
         return self.serializer_class
 
@@ -85,6 +319,71 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Create a recipe object with authenticated user"""
         serializer.save(user=self.request.user)
 
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """Create many recipes in a single transaction"""
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        recipes = serializer.save(user=request.user)
+
+        return Response(
+            data={'ids': [recipe.id for recipe in recipes]},
+            status=status.HTTP_201_CREATED
+        )
+
+    def _facet(self, field, recipe_ids):
+        """Return how many of the recipes link to each tag or ingredient"""
+        links = getattr(Recipe, f'{field}s').through.objects.filter(
+            recipe_id__in=recipe_ids
+        )
+        rows = links.values(f'{field}_id', f'{field}__name').annotate(
+            count=Count('recipe_id')
+        ).order_by('-count', f'{field}__name')
+
+        return [
+            {
+                'id': row[f'{field}_id'],
+                'name': row[f'{field}__name'],
+                'count': row['count'],
+            } for row in rows
+        ]
+
+    @action(methods=['GET'], detail=False, url_path='facets')
+    def facets(self, request):
+        """Count the filtered recipes linked to each tag and ingredient
+
+        Accepts the same filters as the list and runs one aggregate query
+        per facet, with the filtered recipes as a subquery.
+        """
+        recipe_ids = self.get_queryset().order_by().values('id')
+
+        return Response(
+            data={
+                'tags': self._facet('tag', recipe_ids),
+                'ingredients': self._facet('ingredient', recipe_ids),
+            },
+            status=status.HTTP_200_OK
+        )
+
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        """Stream the user's recipes as NDJSON or CSV"""
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'export_format': _(
+                'Must be one of: %s') % ', '.join(EXPORT_FORMATS)})
+
+        encode, content_type = EXPORT_FORMATS[export_format]
+        queryset = self.get_queryset().prefetch_related(None).order_by('id')
+        response = StreamingHttpResponse(
+            encode(export_rows(queryset, settings.RECIPE_EXPORT_CHUNK_SIZE)),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{export_format}"'
+        )
+        return response
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         """Upload image to a recipe"""
@@ -94,7 +393,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
             data=request.data
         )
         if serializer.is_valid():
-            serializer.save()
+            serializer.save(
+                image_status=Recipe.ImageStatus.PENDING,
+                image_renditions={},
+                image_queued=timezone.now(),
+            )
+            schedule_renditions(recipe)
             return Response(
                 data=serializer.data,
                 status=status.HTTP_200_OK
@@ -104,3 +408,115 @@ class RecipeViewSet(viewsets.ModelViewSet):
             data=serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+    @action(methods=['POST'], detail=True, url_path='upload-sessions')
+    def upload_sessions(self, request, pk=None):
+        """Start a resumable upload of the recipe image"""
+        recipe = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.save(recipe=recipe)
+        uploads.start_upload(upload)
+
+        return Response(data=serializer.data, status=status.HTTP_201_CREATED)
+
+
+class RecipeImageUploadViewSet(ReplicaReadMixin,
+                               SerializerTimingMixin,
+                               viewsets.GenericViewSet,
+                               mixins.RetrieveModelMixin):
+    """Receive recipe images in resumable chunks"""
+    # Clients resume from the offset, which must never be stale
+    read_from_replica = False
+    serializer_class = serializers.RecipeImageUploadSerializer
+    queryset = RecipeImageUpload.objects.all()
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        """Return upload sessions of the authenticated user only"""
+        return self.queryset.filter(recipe__user=self.request.user)
+
+    def _resume_at(self, upload, message,
+                   status_code=status.HTTP_409_CONFLICT):
+        """Return an error response telling the client where to resume"""
+        return Response(
+            data={'detail': message, 'offset': upload.offset},
+            status=status_code
+        )
+
+    @action(methods=['PUT'], detail=True, url_path='chunk')
+    def chunk(self, request, pk=None):
+        """Write the request body into the upload at ?offset="""
+        try:
+            offset = int(request.query_params['offset'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+            if offset < 0 or length < 0:
+                raise ValueError
+        except (KeyError, ValueError):
+            raise ValidationError({'offset': _('A valid offset is required')})
+
+        upload = get_object_or_404(self.get_queryset(), pk=pk)
+        # Concurrent chunks are turned away rather than left to wait, so a
+        # slow client never blocks others
+        with uploads.chunk_lock(upload) as locked:
+            if not locked:
+                return self._resume_at(
+                    upload, _('Another chunk is being received')
+                )
+            upload.refresh_from_db(fields=['offset'])
+            if offset != upload.offset:
+                return self._resume_at(
+                    upload, _('Chunks must start at the received offset'),
+                    status.HTTP_400_BAD_REQUEST
+                )
+            if offset + length > upload.size:
+                raise ValidationError(_('Chunk exceeds the declared size'))
+
+            try:
+                written = uploads.write_chunk(
+                    upload, request.stream, offset, length
+                )
+            except FileNotFoundError:
+                raise Http404
+            upload.offset = offset + written
+            self.get_queryset().filter(pk=pk).update(offset=upload.offset)
+
+        return Response(data=self.get_serializer(upload).data)
+
+    @action(methods=['POST'], detail=True, url_path='finalize')
+    def finalize(self, request, pk=None):
+        """Verify a complete upload and attach it to the recipe"""
+        # Concurrent calls wait for the lock, then find the session gone
+        with transaction.atomic():
+            upload = get_object_or_404(
+                self.get_queryset().select_for_update(), pk=pk
+            )
+            if upload.offset != upload.size:
+                return self._resume_at(upload, _('Upload is incomplete'))
+
+            if uploads.file_sha256(upload.path) != upload.sha256:
+                # Which chunk is corrupt is unknown, so resume from the start
+                uploads.restart_upload(upload)
+                return self._resume_at(
+                    upload, _('Checksum mismatch'),
+                    status.HTTP_400_BAD_REQUEST
+                )
+
+            error = None
+            if not uploads.is_image(upload.path):
+                error = {'image': _('Upload is not an image')}
+            else:
+                recipe = uploads.attach_upload(upload)
+                schedule_renditions(recipe)
+            uploads.discard_upload(upload)
+
+        if error:
+            raise ValidationError(error)
+
+        return Response(
+            data=timed_serializer(serializers.RecipeImageSerializer)(
+                recipe, context=self.get_serializer_context()
+            ).data,
+            status=status.HTTP_200_OK
+        )
@@ -1,11 +1,14 @@
-from rest_framework import generics, permissions, authentication
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
+from core.authentication import CachedTokenAuthentication
+from core.middleware import SerializerTimingMixin
+
 from .serializers import UserSerializer, AuthTokenSerializer
 
 
-class CreateUserApiView(generics.CreateAPIView):
+class CreateUserApiView(SerializerTimingMixin, generics.CreateAPIView):
     """A generic Api view that creates a new user"""
     serializer_class = UserSerializer
 
@@ -16,10 +19,11 @@ class CreateTokenView(ObtainAuthToken):
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(SerializerTimingMixin,
+                     generics.RetrieveUpdateAPIView):
     """Update an authenticated user's information"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication, )
+    authentication_classes = (CachedTokenAuthentication, )
     permission_classes = (permissions.IsAuthenticated, )
 
     def get_object(self):